@@ -0,0 +1,274 @@
+"""
+Offline benchmark and regression check for the speech start/stop detection in speak-es.py.
+
+Replays WAV fixtures through record_audio() using a fake sounddevice input stream, so the
+VoiceActivityDetector thresholds can be measured and compared without a microphone.
+
+Fixtures are read from a directory of 16-bit WAV files plus a labels.json file mapping each
+file name to its labelled speech [start, end] in seconds, or null for recordings without speech.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+import types
+import wave
+
+import numpy as np
+
+GAME_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "speak-es.py")
+
+
+class FakeInputStream:
+    """Stands in for sounddevice.InputStream, replaying samples through the stream callback block by block."""
+    def __init__(self, samplerate, channels, dtype, blocksize, callback):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.samples = np.zeros(0, dtype=np.int16)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def replay(self):
+        """Pushes every block of the loaded samples through the callback, as the audio thread would."""
+        status = types.SimpleNamespace(input_overflow=False)
+        for start in range(0, len(self.samples) - self.blocksize + 1, self.blocksize):
+            self.callback(self.samples[start:start + self.blocksize].reshape(-1, 1), self.blocksize, None, status)
+
+
+def load_game():
+    """Imports speak-es.py with the fake sounddevice module installed in place of the real one."""
+    fake_sd = types.ModuleType("sounddevice")
+    fake_sd.InputStream = FakeInputStream
+    sys.modules["sounddevice"] = fake_sd
+    spec = importlib.util.spec_from_file_location("speak_es", GAME_SCRIPT)
+    game = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(game)
+    return game
+
+
+def read_wav(path, sample_rate):
+    """Reads a 16-bit WAV file as mono int16 samples at the given rate (linear resampling if needed)."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).reshape(-1, channels)[:, 0]
+    if rate != sample_rate:
+        positions = np.arange(int(len(samples) * sample_rate / rate)) * rate / sample_rate
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return samples
+
+
+def run_fixture(game, samples, threshold, silence_duration, timeout_duration, verbose=False):
+    """
+    Records one fixture through record_audio() and returns the detector decisions and CPU cost.
+
+    Args:
+        game: The loaded speak-es.py module.
+        samples (np.ndarray): Mono int16 samples at game.SAMPLE_RATE.
+        threshold (float): RMS silence threshold.
+        silence_duration (float): Pause length that ends a recording, in seconds.
+        timeout_duration (float): Time to wait for speech to start, in seconds.
+        verbose (bool): Print the detector log.
+
+    Returns:
+        dict: Detected speech start and end times in seconds, end reason and CPU seconds used.
+    """
+    engine = game.CaptureEngine()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+    stream = engine.stream
+    # pad with digital silence so a recording never runs out of blocks before max_duration
+    padding = np.zeros(int(game.RECORD_MAX * game.SAMPLE_RATE), dtype=np.int16)
+    stream.samples = np.concatenate((samples, padding))
+    begin = engine.begin
+    def begin_and_replay():
+        begin()
+        stream.replay()
+    engine.begin = begin_and_replay
+    game.CAPTURE = engine
+
+    vad = game.VoiceActivityDetector(silence_threshold=threshold, silence_duration=silence_duration, timeout_duration=timeout_duration)
+    output = sys.stdout if verbose else io.StringIO()
+    cpu_start = time.process_time()
+    with contextlib.redirect_stdout(output):
+        try:
+            game.record_audio(sample_rate=game.SAMPLE_RATE, max_duration=game.RECORD_MAX, vad=vad)
+        except game.sr.WaitTimeoutError:
+            pass # no speech heard, the detector decisions are still scored
+    cpu_time = time.process_time() - cpu_start
+
+    block_time = vad.block_size / vad.sample_rate
+    return {
+        "speech_start": vad.start_block * block_time if vad.start_block else None,
+        "end": vad.end_block * block_time if vad.end_block else None,
+        "end_reason": vad.end_reason,
+        "audio_seconds": vad.block_count * block_time,
+        "cpu_seconds": cpu_time,
+    }
+
+
+def score(label, result):
+    """Compares a detection result with its labelled speech segment."""
+    triggered = result["speech_start"] is not None
+    if label is None:
+        return {"false_trigger": triggered, "missed": False, "start_latency": None, "endpoint_latency": None}
+    start, end = label
+    false_trigger = triggered and result["speech_start"] < start
+    return {
+        "false_trigger": false_trigger,
+        "missed": not triggered,
+        "start_latency": result["speech_start"] - start if triggered and not false_trigger else None,
+        "endpoint_latency": result["end"] - end if triggered and result["end_reason"] == "pause" else None,
+    }
+
+
+def benchmark(fixture_dir, threshold=None, silence_duration=0.5, timeout_duration=None, verbose=False):
+    """
+    Runs every fixture in a directory and aggregates the metrics.
+
+    Returns:
+        dict: Per-fixture results under "fixtures" and the summary metrics under "summary".
+    """
+    game = load_game()
+    threshold = game.MIN_SILENCE_THRESHOLD if threshold is None else threshold
+    timeout_duration = game.RECORD_TIMEOUT if timeout_duration is None else timeout_duration
+    with open(os.path.join(fixture_dir, "labels.json"), "r", encoding="utf-8") as f:
+        labels = json.load(f)
+
+    fixtures = {}
+    for name in sorted(labels):
+        samples = read_wav(os.path.join(fixture_dir, name), game.SAMPLE_RATE)
+        result = run_fixture(game, samples, threshold, silence_duration, timeout_duration, verbose)
+        result.update(score(labels[name], result))
+        fixtures[name] = result
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+    results = list(fixtures.values())
+    audio_seconds = sum(r["audio_seconds"] for r in results)
+    summary = {
+        "fixtures": len(results),
+        "false_trigger_rate": sum(r["false_trigger"] for r in results) / len(results) if results else 0.0,
+        "missed": sum(r["missed"] for r in results),
+        "mean_start_latency": mean(r["start_latency"] for r in results),
+        "mean_endpoint_latency": mean(r["endpoint_latency"] for r in results),
+        "cpu_ms_per_audio_second": 1000 * sum(r["cpu_seconds"] for r in results) / audio_seconds if audio_seconds else 0.0,
+        "threshold": threshold,
+        "silence_duration": silence_duration,
+        "timeout_duration": timeout_duration,
+    }
+    return {"fixtures": fixtures, "summary": summary}
+
+
+def compare(report, baseline, tolerance):
+    """Returns the regressions of a report against a saved baseline report."""
+    regressions = []
+    now, before = report["summary"], baseline["summary"]
+    if now["false_trigger_rate"] > before["false_trigger_rate"]:
+        regressions.append(f"false trigger rate {before['false_trigger_rate']:.2f} -> {now['false_trigger_rate']:.2f}")
+    if now["missed"] > before["missed"]:
+        regressions.append(f"missed speech {before['missed']} -> {now['missed']}")
+    for key in ("mean_start_latency", "mean_endpoint_latency"):
+        if now[key] is not None and before[key] is not None and now[key] > before[key] + tolerance:
+            regressions.append(f"{key} {before[key]:.3f}s -> {now[key]:.3f}s")
+    for name, result in report["fixtures"].items():
+        old = baseline["fixtures"].get(name)
+        if old is not None and old["end_reason"] != result["end_reason"]:
+            regressions.append(f"{name}: end reason {old['end_reason']} -> {result['end_reason']}")
+    return regressions
+
+
+def synthesize_fixtures(fixture_dir, sample_rate=44100, seed=0):
+    """Writes a small synthetic fixture set (voiced tone bursts over noise, and noise only) with labels."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(fixture_dir, exist_ok=True)
+    labels = {}
+
+    def voiced(duration, f0, amplitude):
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        envelope = np.minimum(1, np.minimum(t, t[::-1]) / 0.05)
+        return amplitude * envelope * sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+
+    def noise(duration, level):
+        return rng.normal(0, level, int(duration * sample_rate))
+
+    fixtures = {
+        "speech_quiet_room.wav": (0.8, 0.7, 180, 2500, 30),
+        "speech_loud_room.wav": (0.6, 1.1, 220, 4000, 120),
+        "speech_late_start.wav": (2.0, 0.5, 250, 3000, 50),
+        "noise_only_hiss.wav": (None, None, None, None, 400),
+        "noise_only_quiet.wav": (None, None, None, None, 40),
+    }
+    for name, (start, length, f0, amplitude, level) in fixtures.items():
+        samples = noise(5.0, level)
+        if start is not None:
+            begin = int(start * sample_rate)
+            speech = voiced(length, f0, amplitude)
+            samples[begin:begin + len(speech)] += speech
+            labels[name] = [start, start + length]
+        else:
+            labels[name] = None
+        with wave.open(os.path.join(fixture_dir, name), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(np.clip(samples, -32768, 32767).astype(np.int16).tobytes())
+    with open(os.path.join(fixture_dir, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(labels, f, indent=4)
+
+
+def print_report(report):
+    print(f"{'fixture':32} {'start':>7} {'end':>7} {'reason':>8} {'start lat':>10} {'end lat':>8} {'false':>6}")
+    for name, r in report["fixtures"].items():
+        def fmt(value):
+            return f"{value:.2f}" if value is not None else "-"
+        print(f"{name:32} {fmt(r['speech_start']):>7} {fmt(r['end']):>7} {str(r['end_reason']):>8} {fmt(r['start_latency']):>10} {fmt(r['endpoint_latency']):>8} {str(r['false_trigger']):>6}")
+    summary = report["summary"]
+    print()
+    for key, value in summary.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay WAV fixtures through the game's speech detection and report its accuracy and cost.")
+    parser.add_argument("fixture_dir", help="directory with WAV fixtures and labels.json")
+    parser.add_argument("--threshold", type=float, help="RMS silence threshold (default: MIN_SILENCE_THRESHOLD)")
+    parser.add_argument("--silence-duration", type=float, default=0.5, help="pause that ends a recording, in seconds (default: 0.5)")
+    parser.add_argument("--timeout", type=float, help="time to wait for speech, in seconds (default: RECORD_TIMEOUT)")
+    parser.add_argument("--synthesize", action="store_true", help="write a synthetic fixture set into fixture_dir first")
+    parser.add_argument("--save", help="write the report as JSON, to use as a baseline later")
+    parser.add_argument("--baseline", help="compare against a saved report and exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed latency increase over the baseline, in seconds (default: 0.05)")
+    parser.add_argument("--verbose", action="store_true", help="print the detector log for every fixture")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize_fixtures(args.fixture_dir)
+    report = benchmark(args.fixture_dir, args.threshold, args.silence_duration, args.timeout, args.verbose)
+    print_report(report)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -6,19 +6,32 @@ Date: 2025-08-05
 import pygame
 import pygame.midi
 import json
+import argparse
+import hashlib
 import os
 import io
+import mmap
 import random
+from collections import OrderedDict, deque
 from gtts import gTTS
 import speech_recognition as sr
 import threading
+import queue
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 import numpy as np
 import sounddevice as sd
 from datetime import datetime
+try:
+    import vosk # optional, for offline speech recognition
+except ImportError:
+    vosk = None
 
 # --- Global Constants and Configuration ---
 GENERATE_SFX = True  # Whether to generate sound files for words
+SFX_WORKERS = 4  # Parallel TTS requests when generating word sound files
+SOUND_BANK_CAPACITY = 150  # Decoded word sounds kept in memory, least recently used ones are evicted
 DEFAULT_LANGUAGE = "es"
 CONFIG_FILE_PATH = "config_es.json"
 SOUND_TYPE_FILE = "assets/sounds/mouse_click.wav"
@@ -44,14 +57,44 @@ TEXT_COLOR = BLACK
 TARGET_WORDS = 5
 TARGET_PHRASES = 5
 FPS = 60
+ACTIVE_FPS = FPS  # Frame rate while something animates (running timer, dance)
+IDLE_FPS = 4  # Frame rate while the screen only changes on input or recognizer results
+RETAINED_RENDERING = True  # Draw the word screen once and only redraw the parts that change
+FRAME_STATS_INTERVAL = 10  # Seconds between render cost reports, 0 to turn them off
+TEXT_CACHE_SIZE = 512  # Rendered text surfaces and layouts kept by TEXT_CACHE
 MUSICAL_KEYBOARD = True
 CLIPART_PATH = "assets/images/clipart/vector"
-STOP_APP = False
-
-# Shared variable
-RECOGNIZED_TEXT = ""
-RECOGNIZED_DATA = None
-RECOGNIZER_STATUS = "READY"
+CLIPART_INDEX_FILE = "assets/images/clipart/clipart_index.json"
+CLIPART_INDEX = None
+UNKNOWN_IMAGE_FILE = "assets/images/images/unknown_001.png"
+MICROPHONE_IMAGE_FILE = "assets/images/images/microphone_001.png"
+MENU_BACKGROUND_FILE = "assets/images/images/cover_speaking_girl.png"
+SOUNDS_PATH = "assets/sounds"
+SOUND_PACK_FILE = "assets/sounds/word_sounds.pcm"
+SOUND_PACK_INDEX_FILE = "assets/sounds/word_sounds.json"
+TTS_CACHE_DIR = "assets/sounds/tts_cache"
+IMAGE_CACHE_BUDGET = 64 * 1024 * 1024  # Bytes of decoded, scaled surfaces kept in memory
+
+# Posted by RecognizerService with the recognition results
+RECOGNITION_EVENT = pygame.USEREVENT + 1
+# Posted by the AudioSequencer channel each time one of its sounds ends
+AUDIO_EVENT = pygame.USEREVENT + 2
+AUDIO_CHANNEL = 0  # Mixer channel reserved for the spoken prompts, so Sound.play() never takes it
+
+# speech recognition backend: "google" (online), "vosk" (offline, local model) or "stub" (tests)
+RECOGNIZER_BACKEND = os.environ.get("SPEECH_RECOGNIZER", "google")
+RECOGNIZER_WARMUP = True  # Load the recognizer model at startup instead of on the first answer
+RECOGNITION_DEADLINE = 8  # Seconds a recognition may take after recording before the answer is given up
+RECOGNITION_WORKERS = 2  # Recognitions that can run at once, so a slow one doesn't hold up the next word
+RECOGNITION_CACHE = os.environ.get("RECOGNITION_CACHE", "0") == "1"  # Reuse transcripts of audio recognized before (retries, replayed test fixtures)
+RECOGNITION_CACHE_SIZE = 256  # Transcripts kept in the recognition cache
+RECOGNITION_CACHE_TTL = 600  # Seconds a cached transcript stays valid
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "models/vosk-model-small-es-0.42")
+STREAMING_RECOGNITION = True  # Decode while recording for backends that support it (vosk)
+VOSK_GRAMMAR = True  # Restrict Vosk to the expected word and its distractors instead of open dictation
+TEMPLATE_DISTRACTORS = 4  # Other words of the list the answer is scored against
+TEMPLATE_MIN_MARGIN = 0.05  # Relative distance the expected word must win by in the template recognizer
+TEMPLATE_MAX_DISTANCE = 6.0  # Template distance above which the answer matches no word at all, see the logged scores
 
 # recording parameters
 RECORD_TIMEOUT = 3
@@ -60,189 +103,915 @@ SAMPLE_RATE = 44100
 BLOCK_SIZE = 2048
 PAUSE_THRESHOLD = 1
 MIN_SILENCE_THRESHOLD = 200
-RUN_SILENCE_THRESHOLD = MIN_SILENCE_THRESHOLD
+NOISE_FLOOR_WINDOW = 10  # Seconds of idle microphone audio the noise floor is estimated from
+NOISE_FLOOR_PERCENTILE = 50  # Percentile of the idle block levels taken as the noise floor
 ZCR_NOISE_THRESHOLD = 0.2  # Zero-crossing rate threshold for noise detection
 ZCR_SPEECH_THRESHOLD = 0.15  # Zero-crossing rate threshold for speech detection
+RECORD_PREROLL = 0.5  # Seconds of audio kept from before speech is first heard
+RECOGNITION_SAMPLE_RATE = 16000  # Rate the recordings are resampled to before recognition, playback keeps SAMPLE_RATE
+VAD_SKIP_BLOCKS = 10  # Initial blocks ignored while the microphone stabilizes
+VAD_SPEECH_START_BLOCKS = 5  # Speech-like blocks needed to confirm speech start
+VAD_PAUSE_RESET_BLOCKS = 5  # Consecutive speech blocks that cancel a pause
+VAD_SUBFRAME_SIZE = 256  # Samples per analysis sub-frame within a block
+
+class NoiseFloorTracker:
+    """Estimates the ambient noise level from the microphone blocks captured between answers.
+
+    update() runs on the audio thread and only stores the mean level of each block in a ring covering
+    the last NOISE_FLOOR_WINDOW seconds. threshold() takes a percentile of that window, so the threshold
+    follows the room as it gets louder or quieter. Most of the time between answers the game's own
+    prompts or the victory song are playing, so their players pause the tracker and those blocks are skipped.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE, window=NOISE_FLOOR_WINDOW, percentile=NOISE_FLOOR_PERCENTILE):
+        self.levels = np.zeros(max(1, int(window * sample_rate / block_size)))
+        self.percentile = percentile
+        self.index = 0
+        self.count = 0
+        self.paused_by = set() # sources of game sound playing now, the microphone would pick them up
+
+    @property
+    def paused(self):
+        return bool(self.paused_by)
+
+    def pause(self, source, paused=True):
+        """Skips the idle blocks while the given source, e.g. "prompts" or "song", is playing."""
+        if paused:
+            self.paused_by.add(source)
+        else:
+            self.paused_by.discard(source)
+
+    def update(self, block):
+        self.levels[self.index] = np.abs(block).mean()
+        self.index = (self.index + 1) % len(self.levels)
+        self.count = min(self.count + 1, len(self.levels))
+
+    def level(self):
+        """Returns the current noise floor, or None before any idle audio has been seen."""
+        if not self.count:
+            return None
+        return float(np.percentile(self.levels[:self.count], self.percentile))
+
+    def threshold(self):
+        """Returns the silence threshold for the next recording."""
+        level = self.level()
+        if level is None:
+            return MIN_SILENCE_THRESHOLD
+        return max(MIN_SILENCE_THRESHOLD, -(-level * 1.5 // 100) * 100) # Round up to nearest 100 for better thresholding
+
+class VoiceActivityDetector:
+    """Block-based voice activity detector using energy, zero-crossing rate and an optional spectral flatness gate.
+
+    feed(block) classifies one block and advances the speech start / pause state machine, returning one of
+    "skip", "waiting", "candidate" (speech-like block before speech is confirmed), "speech", "silence" or "end".
+    detect(audio) runs the same logic over a whole recording for offline evaluation.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE, silence_threshold=MIN_SILENCE_THRESHOLD, silence_duration=.5, timeout_duration=RECORD_TIMEOUT,
+                 zcr_speech_threshold=ZCR_SPEECH_THRESHOLD, zcr_noise_threshold=ZCR_NOISE_THRESHOLD, skip_blocks=VAD_SKIP_BLOCKS,
+                 speech_start_blocks=VAD_SPEECH_START_BLOCKS, pause_reset_blocks=VAD_PAUSE_RESET_BLOCKS, max_flatness=None, subframe_size=VAD_SUBFRAME_SIZE, verbose=False):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.silence_threshold = silence_threshold
+        self.zcr_speech_threshold = zcr_speech_threshold
+        self.zcr_noise_threshold = zcr_noise_threshold
+        self.skip_blocks = skip_blocks # initial blocks ignored while the microphone stabilizes
+        self.speech_start_blocks = speech_start_blocks # speech-like blocks needed to confirm speech start
+        self.pause_blocks = int(silence_duration * sample_rate / block_size) # silent blocks that end the recording
+        self.pause_reset_blocks = pause_reset_blocks # consecutive speech blocks that cancel a pause
+        self.timeout_blocks = int(timeout_duration * sample_rate / block_size)
+        self.min_speech_blocks = skip_blocks + speech_start_blocks
+        self.max_flatness = max_flatness # optional spectral flatness gate, noise is flatter than voiced speech
+        self.subframe_size = subframe_size
+        self.verbose = verbose
+        self.window = np.hanning(subframe_size).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        self.block_count = 0
+        self.speech_start_counter = 0
+        self.speech_started = False
+        self.pause_counter = 0
+        self.pause_reset_counter = 0
+        self.candidate_block = None
+        self.start_block = None
+        self.end_block = None
+        self.end_reason = None
+        self.features = {}
+
+    def analyze(self, block):
+        """Computes RMS and ZCR of a block over sub-frames in one batch, plus spectral flatness when it is gated on."""
+        samples = np.asarray(block).reshape(-1).astype(np.float32)
+        frame_count = max(1, len(samples) // self.subframe_size)
+        frames = samples[:frame_count * self.subframe_size].reshape(frame_count, -1)
+        if frames.shape[1] != self.subframe_size:
+            frames = np.pad(frames, ((0, 0), (0, self.subframe_size - frames.shape[1])))
+
+        frame_energy = np.mean(frames ** 2, axis=1)
+        crossings = np.abs(np.diff(np.sign(samples))) / 2
+        self.features = {
+            "rms": float(np.sqrt(np.mean(frame_energy))),
+            "zcr": float(crossings.mean()) if len(crossings) else 0.0,
+        }
+        if self.max_flatness is not None: # the FFT is only needed for the flatness gate
+            power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2 + 1e-10
+            self.features["flatness"] = float((np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)).mean())
+        return self.features
+
+    def is_tonal(self, features):
+        return self.max_flatness is None or features["flatness"] <= self.max_flatness
+
+    def log(self, message):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {self.block_count}: {message}, RMS: {self.features['rms']:.2f}, ZCR: {self.features['zcr']:.4f}")
+
+    def feed(self, block):
+        """Classifies the next block of a recording and returns the detector state."""
+        if self.end_reason is not None:
+            return "end"
+        self.block_count += 1
+        if self.block_count < self.skip_blocks:
+            return "skip"
+
+        features = self.analyze(block)
+        state = "waiting"
+        if not self.speech_started:
+            # speech-like blocks don't need to be contiguous to confirm speech start
+            if features["rms"] >= self.silence_threshold and features["zcr"] < self.zcr_speech_threshold and self.is_tonal(features): # block is speech (not silent and not noisy)
+                state = "candidate"
+                self.speech_start_counter += 1
+                if self.candidate_block is None:
+                    self.candidate_block = self.block_count
+                if self.speech_start_counter >= self.speech_start_blocks:
+                    self.speech_started = True
+                    self.start_block = self.block_count
+                    self.log("Speech started")
+            elif self.verbose:
+                self.log("No speech detected")
+            if self.block_count >= self.timeout_blocks:
+                self.end_block = self.block_count
+                self.end_reason = "timeout"
+                self.log(f"Timeout reached, speech_started: {self.speech_started}")
+                return "end"
+
+        if self.speech_started:
+            if features["rms"] < self.silence_threshold or features["zcr"] > self.zcr_noise_threshold or not self.is_tonal(features): # block is silent or noisy
+                state = "silence"
+                self.pause_counter += 1
+                self.pause_reset_counter = 0
+            else:
+                state = "speech"
+                if self.pause_counter > 0:
+                    self.pause_reset_counter += 1
+                    if self.pause_reset_counter >= self.pause_reset_blocks:
+                        self.pause_counter = 0
+                        self.pause_reset_counter = 0
+            if self.verbose:
+                self.log(f"{state}, pause_counter: {self.pause_counter}")
+            if self.pause_counter >= self.pause_blocks and self.block_count >= self.pause_counter + self.min_speech_blocks:
+                self.end_block = self.block_count
+                self.end_reason = "pause"
+                self.log(f"Pause detected, pause_counter: {self.pause_counter}")
+                return "end"
+        return state
+
+    def detect(self, audio):
+        """Runs the detector over a whole recording, returns when speech was first heard, confirmed and ended, in seconds."""
+        self.reset()
+        samples = np.asarray(audio).reshape(-1)
+        for start in range(0, len(samples) - self.block_size + 1, self.block_size):
+            if self.feed(samples[start:start + self.block_size]) == "end":
+                break
+        block_time = self.block_size / self.sample_rate
+        return {
+            "speech_candidate": (self.candidate_block - 1) * block_time if self.candidate_block else None,
+            "speech_start": self.start_block * block_time if self.start_block else None,
+            "end": self.end_block * block_time if self.end_block else None,
+            "end_reason": self.end_reason,
+            "blocks": self.block_count,
+        }
+
+class RingBufferRecorder:
+    """Records int16 mono audio into a preallocated buffer sized for the longest recording.
+
+    Until speech is marked the first RECORD_PREROLL seconds of the buffer act as a ring, so only the
+    latest pre-roll is kept. From then on samples are written contiguously after it and the take is
+    handed out as a zero-copy memoryview. Two buffers are alternated, so the previous take stays valid
+    while the next one records.
+    """
+    def __init__(self, max_duration=RECORD_MAX, sample_rate=SAMPLE_RATE, preroll=RECORD_PREROLL):
+        self.capacity = int(max_duration * sample_rate)
+        self.preroll = int(preroll * sample_rate)
+        self.buffers = [np.zeros(self.capacity, dtype=np.int16) for _ in range(2)]
+        self.current = 1
+        self.reset()
+
+    def reset(self):
+        """Starts a new take in the other buffer."""
+        self.current = 1 - self.current
+        self.buffer = self.buffers[self.current]
+        self.end = 0 # samples written, counted over the whole ring while not linear
+        self.linear = False
+
+    def write(self, block):
+        """Appends a block of samples, returns False once the buffer is full."""
+        samples = block.reshape(-1)
+        if self.linear:
+            count = min(len(samples), self.capacity - self.end)
+            self.buffer[self.end:self.end + count] = samples[:count]
+            self.end += count
+            return count == len(samples)
+
+        if len(samples) > self.preroll:
+            self.end += len(samples) - self.preroll
+            samples = samples[-self.preroll:]
+        index = self.end % self.preroll
+        first = min(len(samples), self.preroll - index)
+        self.buffer[index:index + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.end += len(samples)
+        return True
+
+    def mark_speech(self):
+        """Keeps the pre-roll in order at the start of the buffer and records contiguously from here on."""
+        if self.linear:
+            return
+        if self.end > self.preroll:
+            index = self.end % self.preroll
+            self.buffer[:self.preroll] = np.concatenate((self.buffer[index:self.preroll], self.buffer[:index]))
+            self.end = self.preroll
+        self.linear = True
+
+    def view(self):
+        """Returns the take as a memoryview of raw bytes, without copying."""
+        self.mark_speech()
+        return memoryview(self.buffer[:self.end]).cast("B")
+
+RECORDER = RingBufferRecorder()
+
+class CaptureEngine:
+    """Callback-driven microphone capture. The audio thread queues blocks between begin() and end(), the recorder consumes them."""
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.blocks = queue.SimpleQueue()
+        self.capturing = False
+        self.stream = None
+        self.overflows = 0
+        self.begin_time = None
+        self.noise_floor = NoiseFloorTracker(sample_rate, block_size)
+
+    def start(self):
+        if self.stream is None:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting sound recording stream... ")
+            self.stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16', blocksize=self.block_size, callback=self.callback)
+            self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def callback(self, indata, frames, time_info, status):
+        # runs on the PortAudio thread, so only copy the block out
+        if status.input_overflow:
+            self.overflows += 1
+            return
+        if self.capturing:
+            self.blocks.put(indata.copy())
+        elif not self.noise_floor.paused:
+            self.noise_floor.update(indata)
+
+    def begin(self):
+        """Drops any stale blocks and starts queueing new ones."""
+        while True:
+            try:
+                self.blocks.get_nowait()
+            except queue.Empty:
+                break
+        self.begin_time = time.perf_counter()
+        self.capturing = True
 
-def calibrate_threshold(duration=3):
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Calibrating background noise level...")
-    calibration_audio = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='int16')
-    sd.wait()
-    ambient_noise_level = np.abs(calibration_audio).mean()
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ambient noise level: {ambient_noise_level}")
-    target_threshold = max(MIN_SILENCE_THRESHOLD, -(-ambient_noise_level * 1.5 // 100) * 100) # Round up to nearest 100 for better thresholding
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Calibration complete. Using threshold: {target_threshold}")
-    return target_threshold
-
-def zero_crossing_rate(audio_chunk):
-    # Compute ZCR: count zero-crossings divided by number of samples
-    return np.mean(np.abs(np.diff(np.sign(audio_chunk)))) / 2
-
-print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting sound recording stream... ")
-stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16', blocksize=BLOCK_SIZE)
-stream.start()
-
-def record_audio(sample_rate=44100, silence_threshold=500, silence_duration=.5, timeout_duration=5, max_duration=10):
+    def read(self, timeout=1.0):
+        """Returns the next captured block, or None if nothing arrived within the timeout."""
+        try:
+            return self.blocks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def end(self):
+        self.capturing = False
+
+CAPTURE = CaptureEngine()
+
+def record_audio(sample_rate=44100, silence_threshold=500, silence_duration=.5, timeout_duration=5, max_duration=10, vad=None, on_block=None, stop_event=None):
     chunk_size = BLOCK_SIZE  # Number of samples per chunk
-    silence_samples = int(silence_duration * sample_rate / chunk_size) # Calculate number of chunks for silence duration
-    timeout_samples = int(timeout_duration * sample_rate / chunk_size)
     max_samples = int(max_duration * sample_rate)
-    skip_chunks = 10  # Number of initial chunks to skip for microphone stabilization
-    speech_start_required = 5  # Number of chunks to confirm speech start
-    speech_start_counter = 0
-    speech_started = False
-    min_speech_chunks = skip_chunks + speech_start_required  # Minimum speech chunks required for speech detection, about 0.5 seconds at SAMPLE_RATE=44100
-    audio_data = []
-    chunk_count = 0
-    pause_counter = 0 # Count consecutive silent chunks for silence detection
-    pause_reset_counter = 0
-    noise_counter = 0
-    
+    if vad is None:
+        vad = VoiceActivityDetector(sample_rate=sample_rate, block_size=chunk_size, silence_threshold=silence_threshold, silence_duration=silence_duration, timeout_duration=timeout_duration)
+    vad.reset()
+
     # # Warm-up period to stabilize microphone (0.1 seconds)
     # for _ in range(int(0.1 * sample_rate / chunk_size)):
     #     stream.read(chunk_size)
-    
-    while pygame.mixer.get_busy(): 
-        pygame.time.Clock().tick(FPS)
 
-    stream.read(stream.read_available) # Clear any buffered audio data before starting recording
+    RECORDER.reset()
+    CAPTURE.begin() # Clear any buffered audio data before starting recording
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recording started. Speak now...")
 
-    for _ in range(int(max_samples / chunk_size)):
-        pygame.time.Clock().tick(120)
-        chunk, overflow = stream.read(chunk_size)
-        if overflow or chunk.size == 0:
-            continue  # Skip invalid or empty chunks
-        audio_data.append(chunk)
-        chunk_count += 1
-        if chunk_count < skip_chunks: # skip first 10 chunks to allow microphone to stabilize
-            continue
-        
-        # Calculate RMS amplitude safely
-        mean_square = np.mean(chunk.astype(np.float64)**2)
-        if np.isnan(mean_square) or mean_square <= 0:
-            rms = 0.0
-        else:
-            rms = np.sqrt(mean_square)
-        
-        # Calculate ZCR, use for next-gen speech detection
-        zcr = zero_crossing_rate(chunk[:, 0])  # Use first channel if stereo
-        if not speech_started and zcr > ZCR_NOISE_THRESHOLD:
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: noise detected, ZCR = {zcr:.4f}")
-        
-        # Check for speech (require contiguous chunks)
-        if not speech_started:
-            if rms >= silence_threshold and zcr < ZCR_SPEECH_THRESHOLD: # chunk is speech (not silent and not noisy)
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: speech_start_counter: {speech_start_counter}, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-                speech_start_counter += 1
-                if speech_start_counter >= speech_start_required:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Speech started at chunk {chunk_count}, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-                    speech_started = True
-            # else: # reset speech start counter if chunk is silent or noisy
-            #     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: silence detected,reset speech_start_counter, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-            #     speech_start_counter = 0  # Reset on non-speech chunk
-            # If no speech and min_duration reached, stop
-            else:
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: No speech detected, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-                
-            if chunk_count >= timeout_samples: # enough silent chunks recorded
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: Timeout reached, speech_started: {speech_started}, stopping recording.")
+    try:
+        for _ in range(int(max_samples / chunk_size)):
+            chunk = CAPTURE.read()
+            if chunk is None:
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No audio from the input stream, stopping recording.")
                 break
+            block_time = time.perf_counter() # the take ends on this block at the latest
+            if vad.block_count == 0:
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Capture started in {(time.perf_counter() - CAPTURE.begin_time) * 1000:.1f} ms.")
+            if not RECORDER.write(chunk):
+                break # recording buffer is full
+            if on_block is not None:
+                on_block(chunk)
+            if stop_event is not None and stop_event.is_set():
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {vad.block_count}: Answer already recognized, stopping recording.")
+                break
+            state = vad.feed(chunk)
+            if state == "candidate":
+                RECORDER.mark_speech() # keep the pre-roll and record contiguously from the first speech-like chunk
+            elif state == "end":
+                break
+    finally:
+        CAPTURE.end() # stop queueing blocks even if the recognizer hook or the detector failed
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Total chunks {vad.block_count}, pause_counter: {vad.pause_counter}: Recording finished.")
+
+    if not vad.block_count:
+        raise sr.WaitTimeoutError("No audio from the input stream")
+    if vad.end_reason == "timeout" and vad.start_block is None:
+        raise sr.WaitTimeoutError("No speech heard before the timeout") # don't hand the pre-roll on as an answer
+
+    audio = sr.AudioData(RECORDER.view(), sample_rate, 2)
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Audio handed off {(time.perf_counter() - block_time) * 1000:.1f} ms after the last block.")
+    return audio
+
+class Resampler:
+    """Polyphase windowed-sinc resampler for int16 audio, e.g. 44.1 kHz to 16 kHz (up 160, down 441).
+
+    The Kaiser-windowed low-pass cuts off just below the lower Nyquist frequency, so nothing above
+    8 kHz aliases into the speech band. Only the taps that meet a real input sample are computed for
+    each output sample.
+    """
+    def __init__(self, from_rate=SAMPLE_RATE, to_rate=RECOGNITION_SAMPLE_RATE, taps_per_phase=64, rolloff=0.9, beta=8.0):
+        divisor = np.gcd(from_rate, to_rate)
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+        self.taps = taps_per_phase
+        length = self.taps * self.up
+        cutoff = rolloff * 0.5 / max(self.up, self.down) # cycles per sample at the upsampled rate
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * self.up
+        self.phases = prototype.reshape(self.taps, self.up).T.astype(np.float32) # phases[p, k] = prototype[p + k * up]
+        self.delay = length // 2
+
+    def resample(self, samples, chunk=16384):
+        """Returns the int16 samples at the target rate."""
+        if self.up == self.down:
+            return np.asarray(samples, dtype=np.int16)
+        samples = np.asarray(samples, dtype=np.float32)
+        padded = np.concatenate((np.zeros(self.taps, dtype=np.float32), samples, np.zeros(self.taps, dtype=np.float32)))
+        output = np.empty(len(samples) * self.up // self.down, dtype=np.int16)
+        k = np.arange(self.taps)
+        for start in range(0, len(output), chunk):
+            t = np.arange(start, min(start + chunk, len(output))) * self.down + self.delay
+            base, phase = np.divmod(t, self.up)
+            values = np.einsum("nk,nk->n", self.phases[phase], padded[base[:, None] - k + self.taps])
+            output[start:start + len(t)] = np.clip(np.round(values), -32768, 32767)
+        return output
+
+RECOGNITION_RESAMPLER = Resampler()
+
+def recognition_audio(audio):
+    """Returns a copy of a recording at RECOGNITION_SAMPLE_RATE for the recognizer, the original stays for playback."""
+    if audio.sample_rate != RECOGNITION_RESAMPLER.from_rate or audio.sample_width != 2:
+        return audio
+    samples = np.frombuffer(audio.frame_data, dtype=np.int16)
+    return sr.AudioData(RECOGNITION_RESAMPLER.resample(samples).tobytes(), RECOGNITION_RESAMPLER.to_rate, 2)
+
+class RecognitionCache:
+    """LRU cache of transcripts keyed by language and a fingerprint of the audio, with a time to live.
+
+    The fingerprint hashes the PCM averaged over a few samples and quantized, so it stays the same
+    for the same recording replayed, whatever container or sample width it went through.
+    """
+    def __init__(self, capacity=RECOGNITION_CACHE_SIZE, ttl=RECOGNITION_CACHE_TTL, decimation=8, quantization=256):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.decimation = decimation
+        self.quantization = quantization
+        self.entries = OrderedDict()  # key -> (expiry time, transcript)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, audio):
+        samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+        samples = samples[:len(samples) // self.decimation * self.decimation].reshape(-1, self.decimation).mean(axis=1)
+        quantized = np.round(samples / self.quantization).astype(np.int16)
+        return hashlib.sha1(quantized.tobytes() + str(audio.sample_rate).encode()).hexdigest()
+
+    def key(self, audio, language, vocabulary=None):
+        return (language, tuple(vocabulary) if vocabulary else None, self.fingerprint(audio))
+
+    def get(self, key):
+        """Returns the cached transcript, or None on a miss or an expired entry."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+class RecognizerBackend:
+    """Base class for speech recognizers. recognize() returns the text or raises sr.UnknownValueError / sr.RequestError."""
+    name = "base"
+    uses_vocabulary = False  # whether the transcript depends on the vocabulary, and so must be part of the cache key
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+        self.cache = RecognitionCache() if RECOGNITION_CACHE else None
+
+    def warm_up(self):
+        """Loads whatever the backend needs up front, so the first answer isn't slower than the rest."""
+        pass
+
+    def transcribe(self, audio, language, vocabulary=None):
+        raise NotImplementedError
+
+    def recognize(self, audio, language=DEFAULT_LANGUAGE, vocabulary=None):
+        """Transcribes the audio. vocabulary optionally lists the expected answer first, followed by distractors."""
+        if self.cache is None:
+            return self.timed(self.transcribe, audio, language, vocabulary)
+        key = self.cache.key(audio, language, vocabulary if self.uses_vocabulary else None)
+        text = self.cache.get(key)
+        if text is not None:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {self.name} recognition served from cache")
+            return text
+        text = self.timed(self.transcribe, audio, language, vocabulary)
+        self.cache.put(key, text)
+        return text
+
+    def stream(self, language=DEFAULT_LANGUAGE, vocabulary=None):
+        """Returns a RecognitionStream to feed blocks to while the answer is still being recorded."""
+        return RecognitionStream(self, language, vocabulary)
+
+    def timed(self, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.last_time = time.perf_counter() - start
+            self.total_time += self.last_time
+            self.calls += 1
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {self.name} recognition took {self.last_time * 1000:.0f} ms")
+
+    def stats(self):
+        stats = {"backend": self.name, "calls": self.calls, "last_ms": self.last_time * 1000, "mean_ms": self.total_time * 1000 / self.calls if self.calls else 0.0}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+class RecognitionStream:
+    """Recognition of one answer fed block by block as it is recorded.
+
+    accept(block) returns the partial transcript so far, finish(audio) returns the final text. This
+    default has no partial results and recognizes the whole recording in finish().
+    """
+    def __init__(self, backend, language, vocabulary):
+        self.backend = backend
+        self.language = language
+        self.vocabulary = vocabulary
+
+    def accept(self, block):
+        return ""
+
+    def finish(self, audio):
+        return self.backend.recognize(recognition_audio(audio), self.language, self.vocabulary)
+
+class VoskStream(RecognitionStream):
+    """Decodes blocks with Vosk as they arrive, so partial transcripts are available while the child speaks."""
+    def __init__(self, backend, language, vocabulary):
+        super().__init__(backend, language, vocabulary)
+        backend.warm_up()
+        self.recognizer = backend.kaldi_recognizer(SAMPLE_RATE, vocabulary)
+        self.parts = []
+
+    def accept(self, block):
+        if self.recognizer.AcceptWaveform(block.tobytes()):
+            self.parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.parts + [partial]).replace("[unk]", "").strip()
+
+    def final(self):
+        self.parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        text = " ".join(self.parts).replace("[unk]", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def finish(self, audio):
+        return self.backend.timed(self.final)
 
-        # If speech started, check for silence
-        if speech_started:
-            if rms < silence_threshold or zcr > ZCR_NOISE_THRESHOLD: # chunk is silent or noisy
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: Silence detected, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-                pause_counter += 1
-                pause_reset_counter = 0
-            else: # chunk is speech
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chunk {chunk_count}: Voice detected, RMS: {rms:.2f}, ZCR: {zcr:.4f}")
-                if pause_counter > 0:
-                    pause_reset_counter += 1
-                    if pause_reset_counter >= 5:  # Reset pause counter after 5 consecutive speech chunks, need to use constant
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Resetting pause_counter after {pause_reset_counter} consecutive speech chunks.")
-                        pause_counter = 0
-                        pause_reset_counter = 0
-            if pause_counter >= silence_samples and chunk_count >= pause_counter + min_speech_chunks:
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] pause detected, pause_counter: {pause_counter}, stopping recording.")
+class GoogleRecognizer(RecognizerBackend):
+    """Google Web Speech API, needs an internet connection."""
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = RECOGNITION_DEADLINE
+
+    def transcribe(self, audio, language, vocabulary=None):
+        return self.recognizer.recognize_google(audio, language=language)
+
+class VoskRecognizer(RecognizerBackend):
+    """Offline recognizer running a local Vosk model in-process. The model decides the language."""
+    name = "vosk"
+    uses_vocabulary = True
+    sample_rate = 16000
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        super().__init__()
+        if vosk is None:
+            raise ImportError("The vosk backend needs the vosk package: pip install vosk")
+        self.model_path = model_path
+        self.model = None
+
+    def warm_up(self):
+        if self.model is None:
+            start = time.perf_counter()
+            vosk.SetLogLevel(-1)
+            self.model = vosk.Model(self.model_path)
+            # decode a little silence so the first real answer doesn't pay for setting up the decoder
+            recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate)
+            recognizer.AcceptWaveform(bytes(self.sample_rate // 5 * 2))
+            recognizer.FinalResult()
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Vosk model {self.model_path} loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def kaldi_recognizer(self, sample_rate, vocabulary=None):
+        if vocabulary and VOSK_GRAMMAR:
+            # only decode the expected answer and its distractors, anything else comes out as [unk]
+            return vosk.KaldiRecognizer(self.model, sample_rate, json.dumps([word.lower() for word in vocabulary] + ["[unk]"], ensure_ascii=False))
+        return vosk.KaldiRecognizer(self.model, sample_rate)
+
+    def stream(self, language=DEFAULT_LANGUAGE, vocabulary=None):
+        return VoskStream(self, language, vocabulary) if STREAMING_RECOGNITION else super().stream(language, vocabulary)
+
+    def transcribe(self, audio, language, vocabulary=None):
+        self.warm_up()
+        recognizer = self.kaldi_recognizer(self.sample_rate, vocabulary)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "").replace("[unk]", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class StubRecognizer(RecognizerBackend):
+    """Returns scripted transcripts in order without looking at the audio, for tests. None means unrecognized."""
+    name = "stub"
+
+    def __init__(self, responses=()):
+        super().__init__()
+        self.responses = list(responses)
+
+    def transcribe(self, audio, language, vocabulary=None):
+        text = self.responses.pop(0) if self.responses else None
+        if text is None:
+            raise sr.UnknownValueError()
+        return text
+
+class TemplateRecognizer(RecognizerBackend):
+    """Keyword matcher that scores the answer against the word sound bank instead of transcribing it.
+
+    The recording and the bank sounds of the expected word and its distractors are resampled with
+    the same Resampler front end, turned into normalized log-mel features and compared with dynamic
+    time warping. The closest word is returned, unless it is further than TEMPLATE_MAX_DISTANCE away
+    or the expected word wins by less than TEMPLATE_MIN_MARGIN, which both count as unrecognized.
+    """
+    name = "template"
+    uses_vocabulary = True
+    sample_rate = 16000
+    frame_size = 512 # 32 ms
+    hop_size = 320 # 20 ms
+    mel_bands = 26
+
+    def __init__(self, sounds=None):
+        super().__init__()
+        self.sounds = sounds # SoundBank the templates are taken from, set by the game once it is loaded
+        self.templates = {}
+        self.resampler = None
+        self.window = np.hanning(self.frame_size).astype(np.float32)
+        self.mel_filters = self.make_mel_filters()
+
+    def make_mel_filters(self):
+        def to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700)
+        edges = 700 * (10 ** (np.linspace(to_mel(80), to_mel(self.sample_rate / 2), self.mel_bands + 2) / 2595) - 1)
+        frequencies = np.fft.rfftfreq(self.frame_size, 1 / self.sample_rate)
+        filters = np.zeros((self.mel_bands, len(frequencies)), dtype=np.float32)
+        for band in range(self.mel_bands):
+            low, center, high = edges[band:band + 3]
+            filters[band] = np.clip(np.minimum((frequencies - low) / (center - low), (high - frequencies) / (high - center)), 0, None)
+        return filters
+
+    def features(self, samples):
+        """Returns mean-normalized log-mel frames of the voiced part of 16 kHz float samples."""
+        if len(samples) < self.frame_size:
+            samples = np.pad(samples, (0, self.frame_size - len(samples)))
+        frame_count = 1 + (len(samples) - self.frame_size) // self.hop_size
+        indices = np.arange(self.frame_size)[None, :] + self.hop_size * np.arange(frame_count)[:, None]
+        power = np.abs(np.fft.rfft(samples[indices] * self.window, axis=1)) ** 2
+        log_mel = np.log(power @ self.mel_filters.T + 1e-6)
+        # trim leading and trailing silence, keeping frames within 30 dB of the loudest one
+        energy = 10 * np.log10(power.sum(axis=1) + 1e-6)
+        voiced = np.flatnonzero(energy > energy.max() - 30)
+        log_mel = log_mel[voiced[0]:voiced[-1] + 1]
+        return log_mel - log_mel.mean(axis=0)
+
+    def template(self, word):
+        """Returns the cached features of a word's sound file, or None if it has no sound yet."""
+        if word not in self.templates:
+            sound = self.sounds.get(word) if self.sounds is not None else None
+            if sound is None:
+                return None
+            samples = pygame.sndarray.samples(sound)
+            if samples.ndim > 1:
+                samples = samples.mean(axis=1)
+            mixer_rate = pygame.mixer.get_init()[0]
+            if self.resampler is None or self.resampler.from_rate != mixer_rate:
+                self.resampler = Resampler(mixer_rate, self.sample_rate)
+            self.templates[word] = self.features(self.resampler.resample(samples).astype(np.float32))
+        return self.templates[word]
+
+    def dtw_distance(self, a, b):
+        cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+        previous = [0.0] + [float("inf")] * len(b)
+        for i in range(len(a)):
+            row_cost = cost[i].tolist()
+            current = [float("inf")] * (len(b) + 1)
+            for j in range(1, len(b) + 1):
+                current[j] = row_cost[j - 1] + min(previous[j - 1], previous[j], current[j - 1])
+            previous = current
+        return previous[-1] / (len(a) + len(b))
+
+    def transcribe(self, audio, language, vocabulary=None):
+        if not vocabulary:
+            raise sr.RequestError("The template recognizer needs the expected word and distractors")
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2), dtype=np.int16).astype(np.float32)
+        utterance = self.features(samples)
+        scores = {}
+        for word in vocabulary:
+            template = self.template(word)
+            if template is not None and len(template) <= 3 * len(utterance) and len(utterance) <= 3 * len(template):
+                scores[word] = self.dtw_distance(utterance, template)
+        if not scores:
+            raise sr.UnknownValueError()
+        ranked = sorted(scores, key=scores.get)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Template scores: " + ", ".join(f"{word}: {scores[word]:.2f}" for word in ranked))
+        best = ranked[0]
+        if scores[best] > TEMPLATE_MAX_DISTANCE:
+            raise sr.UnknownValueError() # nothing in the list sounds like the answer, e.g. noise or another word
+        if best == vocabulary[0] and len(ranked) > 1 and scores[ranked[1]] - scores[best] < TEMPLATE_MIN_MARGIN * scores[ranked[1]]:
+            raise sr.UnknownValueError() # too close to a distractor to call it
+        return best
+
+RECOGNIZER_BACKENDS = {"google": GoogleRecognizer, "vosk": VoskRecognizer, "template": TemplateRecognizer, "stub": StubRecognizer}
+
+def create_recognizer(name=RECOGNIZER_BACKEND):
+    if name not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer backend '{name}', choose one of: {', '.join(RECOGNIZER_BACKENDS)}")
+    return RECOGNIZER_BACKENDS[name]()
+
+class RecognizerService:
+    """Records and recognizes answers on a background thread.
+
+    The game sends commands with listen(), stop_recording() and cancel(). Results come back as
+    RECOGNITION_EVENT pygame events with a status of "PARTIAL", "COMPLETE" or "ERROR", plus the
+    request id, text and recorded audio. The thread blocks on its command queue while idle.
+
+    Recording runs on the service thread; the final recognition of each answer runs as a future on
+    an executor with a deadline, so a cancelled word frees the microphone for the next one at once.
+    Results of a cancelled or superseded request are never posted.
+    """
+    def __init__(self, recognizer, workers=RECOGNITION_WORKERS, deadline=RECOGNITION_DEADLINE):
+        self.recognizer = recognizer
+        self.deadline = deadline
+        self.commands = queue.SimpleQueue()
+        self.recording_stop = threading.Event()
+        self.lock = threading.Lock()
+        self.request = None
+        self.answered = False
+        self.request_ids = itertools.count(1)
+        self.pending = {}  # request id -> recognition future
+        self.executor = ThreadPoolExecutor(workers)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def shutdown(self):
+        self.cancel()
+        self.commands.put(("stop",))
+        self.thread.join()
+        self.executor.shutdown(wait=False) # cancel() already cancelled the pending futures, cancel_futures needs Python 3.9
+
+    def listen(self, vocabulary=None):
+        """Starts recording the next answer and returns its request id. vocabulary lists the expected word first."""
+        with self.lock:
+            self.cancel_pending()
+            self.request = next(self.request_ids)
+            self.answered = False
+            self.recording_stop.set() # free the microphone from a recording still running for an older request
+            self.commands.put(("listen", self.request, vocabulary))
+            return self.request
+
+    def stop_recording(self):
+        """Ends the current recording now, e.g. once the answer is in the partial transcript."""
+        self.recording_stop.set()
+
+    def cancel(self):
+        """Drops the current request, its recording is stopped, its recognition cancelled and its result discarded."""
+        with self.lock:
+            self.cancel_pending()
+            self.request = None
+        self.recording_stop.set()
+
+    def cancel_pending(self):
+        # a recognition already talking to the server can't be interrupted, its result is dropped instead
+        for request, future in self.pending.items():
+            if future.cancel():
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition of request {request} cancelled.")
+        self.pending.clear()
+
+    def is_current(self, request):
+        with self.lock:
+            return request == self.request
+
+    def post(self, request, status, text="", audio=None):
+        """Posts a result for the current request; the first final result wins, later ones are stale."""
+        with self.lock:
+            if request != self.request or self.answered:
+                return
+            if status != "PARTIAL":
+                self.answered = True
+                self.pending.pop(request, None)
+            pygame.event.post(pygame.event.Event(RECOGNITION_EVENT, request=request, status=status, text=text, audio=audio))
+
+    def run(self):
+        while True:
+            command, *args = self.commands.get()
+            if command == "stop":
                 break
-            # if zcr > 0.2:
-            #     noise_counter += 1
-            # else:
-            #     noise_counter = 0
-            # if noise_counter >= silence_samples: # no speech detected for a while
-            #     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Noise duration exceeded, stopping recording.")
-            #     break
-            
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Total chunks {chunk_count}, pause_counter: {pause_counter}: Recording finished.")
-    
-    # Convert audio data to numpy array
-    if not audio_data:
-        return "No audio data recorded."
-    audio = np.concatenate(audio_data, axis=0)
-
-    return sr.AudioData(audio.tobytes(), sample_rate, 2)
-
-def listen_for_speech():
-    global RECOGNIZED_TEXT, RECOGNIZED_DATA, RECOGNIZER_STATUS, STOP_APP
-    
-    # Initialize the speech recognizer
-    recognizer = sr.Recognizer()
-
-    beep_sound = load_sound(SOUND_BEEP_FILE)
-    while not STOP_APP:
-        # check the recognizer status and wait for the "LISTEN" state
-        if RECOGNIZER_STATUS == "LISTEN":
-            RECOGNIZER_STATUS = "LISTENING"
-
-            # wait for any sound playback to finish
-            while pygame.mixer.get_busy(): 
-                pygame.time.Clock().tick(FPS)
-            beep_sound.play()
-
-            # with sr.Microphone() as source:
-            try:
-                audio = record_audio(silence_threshold=RUN_SILENCE_THRESHOLD, timeout_duration=RECORD_TIMEOUT, max_duration=RECORD_MAX, sample_rate=SAMPLE_RATE)
-                if RECOGNIZER_STATUS == "LISTENING":
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognizing speech...")
-                    RECOGNIZED_DATA = audio  
-                    RECOGNIZED_TEXT = recognizer.recognize_google(audio, language=DEFAULT_LANGUAGE)  
-                    # print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition complete...")
-                    RECOGNIZER_STATUS = "COMPLETE" 
-            except sr.WaitTimeoutError:
-                # Handle timeout error
-                if RECOGNIZER_STATUS == "READY":
-                    RECOGNIZED_TEXT = ""
-                    RECOGNIZED_DATA = None  # Clear recognized data if not in listening state
-                else:
-                    RECOGNIZED_TEXT = "TIMEOUT"
-                    RECOGNIZER_STATUS = "ERROR"
-            except sr.UnknownValueError:
-                # Handle unrecognized speech
-                if RECOGNIZER_STATUS == "READY":
-                    RECOGNIZED_TEXT = ""
-                    RECOGNIZED_DATA = None  # Clear recognized data if not in listening state
-                else:
-                    RECOGNIZED_TEXT = "UNRECOGNIZED"
-                    RECOGNIZER_STATUS = "ERROR"
-            except sr.RequestError:
-                # Handle API errors
-                if RECOGNIZER_STATUS == "READY":
-                    RECOGNIZED_TEXT = ""
-                    RECOGNIZED_DATA = None  # Clear recognized data if not in listening state
-                else:
-                    RECOGNIZED_TEXT = "API ERROR"
-                    RECOGNIZER_STATUS = "ERROR"
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition Status: {RECOGNIZER_STATUS}, Text: {RECOGNIZED_TEXT}")
-        pygame.time.Clock().tick(FPS)
+            request, vocabulary = args
+            if self.is_current(request):
+                self.recording_stop.clear()
+                self.recognize_answer(request, vocabulary)
+
+    def recognize_answer(self, request, vocabulary):
+        # the game only sends listen() once its prompt and the beep have finished playing
+        try:
+            # feed the recognizer while recording, partial transcripts let the game end the turn early
+            stream = self.recognizer.stream(DEFAULT_LANGUAGE, vocabulary)
+            partial = ""
+            def on_block(block):
+                nonlocal partial
+                transcript = stream.accept(block)
+                if transcript and transcript != partial:
+                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Partial: {transcript}")
+                    partial = transcript
+                    self.post(request, "PARTIAL", transcript)
+            threshold = CAPTURE.noise_floor.threshold()
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Noise floor: {CAPTURE.noise_floor.level()}, threshold: {threshold}")
+            audio = record_audio(silence_threshold=threshold, timeout_duration=RECORD_TIMEOUT, max_duration=RECORD_MAX, sample_rate=SAMPLE_RATE, on_block=on_block, stop_event=self.recording_stop)
+        except sr.WaitTimeoutError:
+            self.finish(request, "ERROR", "TIMEOUT")
+            return
+        except Exception as e:
+            # a failing streaming backend must not take the service thread down with it
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recording of request {request} failed: {e!r}")
+            self.finish(request, "ERROR", "API ERROR")
+            return
+        with self.lock:
+            if request != self.request:
+                return
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognizing speech...")
+            future = self.executor.submit(stream.finish, audio)
+            self.pending[request] = future
+        timer = threading.Timer(self.deadline, self.expire, (request, future))
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(lambda future: self.recognized(request, future, audio, timer))
+
+    def recognized(self, request, future, audio, timer):
+        timer.cancel()
+        if future.cancelled():
+            return
+        try:
+            self.finish(request, "COMPLETE", future.result(), audio)
+        except sr.UnknownValueError:
+            self.finish(request, "ERROR", "UNRECOGNIZED", audio)
+        except sr.RequestError:
+            self.finish(request, "ERROR", "API ERROR", audio)
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition of request {request} failed: {e!r}")
+            self.finish(request, "ERROR", "API ERROR", audio)
+
+    def expire(self, request, future):
+        if not future.done():
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition of request {request} missed its {self.deadline} s deadline.")
+            future.cancel()
+            self.finish(request, "ERROR", "API ERROR")
+
+    def finish(self, request, status, text, audio=None):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognition Status: {status}, Text: {text}")
+        self.post(request, status, text, audio)
 
 def has_common_word(str1, str2, exclude={"go", "to"}):
     words1 = set(str1.split()) - exclude
     words2 = set(str2.split()) - exclude
     return not words1.isdisjoint(words2)
 
+class ClipartIndex:
+    """Inverted index from clipart filename words to filenames, cached on disk and invalidated by directory mtime."""
+    def __init__(self, path=CLIPART_PATH, index_file=CLIPART_INDEX_FILE, exclude={"go", "to"}):
+        self.path = path
+        self.index_file = index_file
+        self.exclude = exclude
+        self.mtime = None
+        self.index = {}
+
+    def load(self):
+        """Loads the index from disk, rebuilding it if the clipart folder changed since it was saved."""
+        mtime = os.stat(self.path).st_mtime
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("path") == self.path and data.get("mtime") == mtime and set(data.get("exclude", [])) == set(self.exclude):
+                self.mtime = mtime
+                self.index = data["index"]
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Clipart index loaded from {self.index_file}, {len(self.index)} words.")
+                return self
+        except (OSError, ValueError, KeyError):
+            pass
+        self.build(mtime)
+        self.save()
+        return self
+
+    def build(self, mtime=None):
+        """Scans the clipart folder once and maps every filename word to the files containing it."""
+        index = {}
+        for file in sorted(os.listdir(self.path)):
+            for token in set(file.replace("_", " ").lower().split()) - self.exclude:
+                index.setdefault(token, []).append(file)
+        self.mtime = os.stat(self.path).st_mtime if mtime is None else mtime
+        self.index = index
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Clipart index built for {self.path}, {len(self.index)} words.")
+
+    def save(self):
+        try:
+            with open(self.index_file, "w", encoding="utf-8") as f:
+                json.dump({"path": self.path, "mtime": self.mtime, "exclude": sorted(self.exclude), "index": self.index}, f)
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error saving clipart index: {e}")
+
+    def lookup(self, word):
+        """Returns the files sharing at least one word with the given text, same as has_common_word()."""
+        matching_files = set()
+        for token in set(word.lower().split()) - self.exclude:
+            matching_files.update(self.index.get(token, ()))
+        return sorted(matching_files)
+
 def get_matching_files(word):
-    matching_files = [file for file in os.listdir(CLIPART_PATH) if has_common_word(file.replace("_"," ").lower(), word.lower())]
+    global CLIPART_INDEX
+    if CLIPART_INDEX is None:
+        CLIPART_INDEX = ClipartIndex().load()
+    matching_files = CLIPART_INDEX.lookup(word)
     if not matching_files:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No matching files found for word: {word}")
     else:
@@ -250,55 +1019,135 @@ def get_matching_files(word):
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Matching files: {matching_files}")
         return matching_files
 
-def merge_sounds(sound1, sound2):
-    if not pygame.mixer.get_init():
-        pygame.mixer.init()
-
-    # Convert sounds to numpy arrays
-    arr1 = pygame.sndarray.array(sound1)
-    arr2 = pygame.sndarray.array(sound2)
-
-    # Concatenate audio data along the time axis
-    if arr1.ndim == 1:
-        merged = np.concatenate((arr1, arr2))
-    else:  
-        merged = np.concatenate((arr1, arr2), axis=0)
-
-    # Ensure correct data type
-    merged = merged.astype(np.int16)
-
-    # Return combined Sound object
-    return pygame.sndarray.make_sound(merged)
+class PromptComposer:
+    """Joins sounds end to end, keeping the sample arrays of static prompts so they are extracted only once."""
+    def __init__(self):
+        self.arrays = {}
+
+    def register(self, *sounds):
+        """Caches the samples of prompts that are reused for the whole session."""
+        for sound in sounds:
+            self.arrays[id(sound)] = (sound, pygame.sndarray.array(sound))
+
+    def samples(self, sound):
+        cached = self.arrays.get(id(sound))
+        if cached is not None and cached[0] is sound:
+            return cached[1]
+        return pygame.sndarray.samples(sound) # a view into the sound, no copy
+
+    def compose(self, *segments):
+        """Returns one Sound playing the segments back to back, built with a single preallocated copy."""
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        arrays = [self.samples(segment) for segment in segments if segment is not None]
+        merged = np.empty((sum(len(arr) for arr in arrays),) + arrays[0].shape[1:], dtype=np.int16)
+        position = 0
+        for arr in arrays:
+            merged[position:position + len(arr)] = arr
+            position += len(arr)
+        return pygame.sndarray.make_sound(merged)
+
+PROMPT_COMPOSER = PromptComposer()
 
-def play_recorded_audio(audio_data):
-    """Plays back the recorded audio data using Pygame."""
+def merge_sounds(sound1, sound2):
+    return PROMPT_COMPOSER.compose(sound1, sound2)
+
+class AudioSequencer:
+    """Plays sounds back to back on a reserved mixer channel without waiting for them.
+
+    play() appends sounds to the sequence and hands the next one to Channel.queue(), so they follow
+    each other without a gap. The channel posts AUDIO_EVENT whenever a sound ends; the game loop
+    passes those to on_end(), which queues the next sound and runs the on_complete callbacks of
+    finished sequences. Nothing has to poll pygame.mixer.get_busy().
+    """
+    def __init__(self, channel_id=AUDIO_CHANNEL, end_event=AUDIO_EVENT):
+        self.channel_id = channel_id
+        self.end_event = end_event
+        self.channel = None
+        self.segments = deque() # [sound, callbacks], the first one is playing, the second is queued on the channel
+        self.queued = False
+
+    def start(self):
+        """Reserves the channel, call once the mixer is initialized."""
+        pygame.mixer.set_reserved(self.channel_id + 1)
+        self.channel = pygame.mixer.Channel(self.channel_id)
+        self.channel.set_endevent(self.end_event)
+
+    def play(self, *sounds, on_complete=None):
+        """Plays the sounds after whatever is already in the sequence, then calls on_complete."""
+        sounds = [sound for sound in sounds if sound is not None]
+        if not sounds:
+            self.when_idle(on_complete)
+            return
+        was_idle = not self.segments
+        self.segments.extend([sound, []] for sound in sounds)
+        if on_complete is not None:
+            self.segments[-1][1].append(on_complete)
+        if was_idle:
+            self.channel.play(self.segments[0][0])
+        self.queue_next()
+        CAPTURE.noise_floor.pause("prompts")
+
+    def when_idle(self, callback):
+        """Calls the callback once everything in the sequence has played, or now if nothing is playing."""
+        if callback is None:
+            return
+        if self.segments:
+            self.segments[-1][1].append(callback)
+        else:
+            callback()
+
+    def idle(self):
+        return not self.segments
+
+    def queue_next(self):
+        if len(self.segments) > 1 and not self.queued:
+            self.channel.queue(self.segments[1][0])
+            self.queued = True
+
+    def on_end(self):
+        """Handles AUDIO_EVENT: drops the sound that ended, queues the one after and runs its callbacks."""
+        if not self.segments:
+            return
+        if self.channel.get_busy() and (not self.queued or self.channel.get_queue() is not None):
+            return # the head is still playing, this end is left over from stop(), e.g. fetched in the same batch
+        _, callbacks = self.segments.popleft()
+        self.queued = False
+        self.queue_next()
+        CAPTURE.noise_floor.pause("prompts", bool(self.segments))
+        for callback in callbacks:
+            callback()
+
+    def stop(self):
+        """Stops playback and forgets the rest of the sequence and its callbacks."""
+        if self.channel is not None:
+            while self.channel.get_busy():
+                self.channel.stop() # halting starts the queued sound if there is one
+            # the halts post their end events at once, drop them with any end still unhandled
+            pygame.event.clear(self.end_event)
+        self.segments.clear()
+        self.queued = False
+        CAPTURE.noise_floor.pause("prompts", False)
+
+AUDIO_SEQUENCER = AudioSequencer()
+
+def play_recorded_audio(audio_data, on_complete=None):
+    """Plays back the recorded audio data using Pygame, after any prompt still playing. Returns at once."""
     if audio_data:
         try:
             wav_data = audio_data.get_wav_data()
             sound_file = io.BytesIO(wav_data)
             sound = pygame.mixer.Sound(file=sound_file)
-            sound.play()
-            while pygame.mixer.get_busy():
-                pygame.time.Clock().tick(FPS)
+            AUDIO_SEQUENCER.play(sound, on_complete=on_complete)
         except Exception as e:
             print(f"Error playing recorded audio: {e}")
 
-def countdown_timer(duration):
-    global RECOGNIZED_TEXT
-    for i in range(duration, 0, -1):
-        if RECOGNIZED_TEXT:
-            print("\nSpeech detected, stopping countdown.")
-            break
-        print(f"\rCountdown: {i} seconds remaining", end="", flush=True)
-        time.sleep(1)
-    print("\rCountdown complete!", flush=True)
-
-def load_config():
+def load_config(config_path=CONFIG_FILE_PATH):
     """Loads configuration from JSON file or uses default values."""
     try:
-        with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as config_file:
+        with open(config_path, "r", encoding="utf-8") as config_file:
             config = json.load(config_file)
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Configuration loaded from {CONFIG_FILE_PATH}.")
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Configuration loaded from {config_path}.")
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error loading configuration. Using default lists. {e}")
         config = {}
@@ -313,6 +1162,49 @@ def load_sound(filepath):
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error loading sound: {e}")
         return None
 
+class SurfaceCache:
+    """LRU cache of decoded and scaled images, keyed by (path, target height), bounded by a memory budget in bytes."""
+    def __init__(self, budget=IMAGE_CACHE_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.surfaces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, height, width=None):
+        """Returns the image scaled to the given height (and width, if given, otherwise keeping the aspect ratio)."""
+        key = (path, height, width)
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                self.surfaces.move_to_end(key)
+                return surface
+
+        surface = pygame.image.load(path)
+        img_width, img_height = surface.get_size()
+        target_width = width if width is not None else round(img_width * height / img_height)
+        surface = pygame.transform.smoothscale(surface, (target_width, height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() # match the display format so blits are fast
+
+        with self.lock:
+            if key not in self.surfaces:
+                self.surfaces[key] = surface
+                self.used += surface.get_pitch() * surface.get_height()
+            self.surfaces.move_to_end(key)
+            while self.used > self.budget and len(self.surfaces) > 1:
+                _, evicted = self.surfaces.popitem(last=False)
+                self.used -= evicted.get_pitch() * evicted.get_height()
+            return self.surfaces[key]
+
+IMAGE_CACHE = SurfaceCache()
+
+def load_word_background(translate):
+    """Picks a clipart image matching the word, or the fallback image, scaled to half the screen height."""
+    matching_files = get_matching_files(translate)
+    if matching_files:
+        return IMAGE_CACHE.get(os.path.join(CLIPART_PATH, random.choice(matching_files)), 1080 // 2)
+    return IMAGE_CACHE.get(UNKNOWN_IMAGE_FILE, 1080 // 2)
+
 def toggle_fullscreen(screen, screen_width, screen_height, fullscreen):
     """Toggles between fullscreen and windowed mode."""
     fullscreen = not fullscreen
@@ -322,6 +1214,69 @@ def toggle_fullscreen(screen, screen_width, screen_height, fullscreen):
         screen = pygame.display.set_mode((screen_width, screen_height))
     return fullscreen, screen
 
+class TextLayout:
+    """Text wrapped to a width: the lines, the index of each line's first character and the x offset of every character."""
+    def __init__(self, font, text, max_width):
+        words = text.split(" ")
+        lines = []
+        current_line = []
+        for word in words:
+            test_line = " ".join(current_line + [word])
+            if font.size(test_line)[0] <= max_width:
+                current_line.append(word)
+            else:
+                lines.append(" ".join(current_line) + " ") # keep the space the line broke at, so indexes match the text
+                current_line = [word]
+        lines.append(" ".join(current_line))
+        self.lines = lines
+        self.starts = [0]
+        for line in lines[:-1]:
+            self.starts.append(self.starts[-1] + len(line))
+        # offsets[line][i] is the width of the first i characters of the line
+        self.offsets = [[font.size(line[:i])[0] for i in range(len(line) + 1)] for line in lines]
+
+class TextCache:
+    """LRU cache of rendered text surfaces and wrapped layouts, keyed by (font, text, color, max_width)."""
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, key, build):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self.entries[key] = build()
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return value
+
+    def render(self, font, text, color):
+        """Returns the text rendered in one line, antialiased."""
+        return self.cached((font, text, color, None), lambda: font.render(text, True, color))
+
+    def layout(self, font, text, max_width):
+        return self.cached((font, text, None, max_width), lambda: TextLayout(font, text, max_width))
+
+    def render_wrapped(self, font, text, color, max_width):
+        """Returns the text wrapped to max_width and rendered on a transparent surface, 5 pixels between lines."""
+        def build():
+            layout = self.layout(font, text, max_width)
+            surfaces = [self.render(font, line[:-1] if i < len(layout.lines) - 1 else line, color) for i, line in enumerate(layout.lines)]
+            combined_surface = pygame.Surface((max_width, sum(line_surface.get_height() + 5 for line_surface in surfaces)), pygame.SRCALPHA)
+            y = 0
+            for line_surface in surfaces:
+                combined_surface.blit(line_surface, (0, y))
+                y += line_surface.get_height() + 5
+            return combined_surface
+        return self.cached((font, text, color, max_width), build)
+
+TEXT_CACHE = TextCache()
+
 def draw_highlight(surface, input_text, font, position, color, index, max_width, mode):
     """Draws a highlighted character for the prompt text indicating the next character, or user input text indicating a mistake"""
     # possible modes: cursor, prompt, text
@@ -335,38 +1290,24 @@ def draw_highlight(surface, input_text, font, position, color, index, max_width,
     elif mode == "cursor":
         this_text = input_text # we should only want to add cursor at the end of the line, for now
         next_char = ""
-    words = this_text.split(" ")
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + (" " if current_line else "") + word
-        if font.size(test_line)[0] <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line + " ")
-            current_line = word
-    lines.append(current_line)
+    layout = TEXT_CACHE.layout(font, this_text, max_width)
     line_height = font.get_height()
     spacing = 5
 
     # locate current_line, then current_index
-    total_line = ""
-    line_index = 0
+    line_index = len(layout.lines)
     word_index = 0
-    typed_line = ""
-    for line in lines:
-        total_line = total_line + line
-        if  index <= len(total_line):
-            word_index = index - (len(total_line) - len(line))
-            typed_line = line[:word_index]
+    for i, (line, start) in enumerate(zip(layout.lines, layout.starts)):
+        if index <= start + len(line):
+            line_index = i
+            word_index = index - start
             break
-        line_index += 1
 
     if mode != "cursor":
-        typed_width = font.size(typed_line[:-1])[0]
-        next_char_width = font.size(input_text[index - 1])[0]
+        typed_width = layout.offsets[line_index][max(word_index - 1, 0)] if line_index < len(layout.lines) else 0
+        next_char_width = TEXT_CACHE.render(font, input_text[index - 1], TEXT_COLOR).get_width()
     else:
-        typed_width = font.size(typed_line)[0]
+        typed_width = layout.offsets[line_index][word_index] if line_index < len(layout.lines) else 0
         next_char_width = 4
 
     highlight_x = position[0] + typed_width
@@ -378,39 +1319,11 @@ def draw_highlight(surface, input_text, font, position, color, index, max_width,
 
     if mode != "cursor":
         pygame.draw.rect(surface, color, (highlight_x, highlight_y, next_char_width, font.get_height()))
-        next_char_surface =font.render(next_char, True, TEXT_COLOR)
-        surface.blit(next_char_surface, (highlight_x, highlight_y))
+        surface.blit(TEXT_CACHE.render(font, next_char, TEXT_COLOR), (highlight_x, highlight_y))
 
 def render_text_wrapped(text, font, color, max_width):
-    """Renders text wrapped to a given width."""
-    words = text.split(' ')
-    lines = []
-    current_line = []
-
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        test_width, _ = font.size(test_line)
-        if test_width <= max_width:
-            current_line.append(word)
-        else:
-            lines.append(' '.join(current_line))
-            current_line = [word]
-    lines.append(' '.join(current_line))
-
-    surfaces = []
-    total_height = 0
-    for line in lines:
-        line_surface = font.render(line, True, color)
-        surfaces.append(line_surface)
-        total_height += line_surface.get_height() + 5
-
-    combined_surface = pygame.Surface((max_width, total_height), pygame.SRCALPHA)
-    y = 0
-    for line_surface in surfaces:
-        combined_surface.blit(line_surface, (0, y))
-        y += line_surface.get_height() + 5
-
-    return combined_surface
+    """Renders text wrapped to a given width. The surface comes from TEXT_CACHE, so it must not be drawn on."""
+    return TEXT_CACHE.render_wrapped(font, text, color, max_width)
 
 def open_config_file():
     """Opens the configuration file with the default OS editor."""
@@ -429,14 +1342,231 @@ def open_config_file():
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error opening config file: {e}")
 
-def generate_speech_sound(text):
-    """Generates and returns a Pygame sound object from text using gTTS."""
-    gtext = text if text else "nothing"
+def gtts_synthesizer(text, lang, slow):
+    """Synthesizes speech with gTTS and returns the MP3 data."""
     buffer = io.BytesIO()
-    tts = gTTS(text=gtext, lang=DEFAULT_LANGUAGE, slow=False)
+    tts = gTTS(text=text, lang=lang, slow=slow)
     tts.write_to_fp(buffer)
-    buffer.seek(0)
-    sound = pygame.mixer.Sound(buffer)
+    return buffer.getvalue()
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized speech, keyed by (text, lang, slow).
+
+    The synthesizer is any callable taking (text, lang, slow) and returning audio file data
+    that pygame can load, so gTTS can be swapped for an offline engine or a local stub.
+    """
+    def __init__(self, cache_dir=TTS_CACHE_DIR, synthesizer=gtts_synthesizer, extension=".mp3"):
+        self.cache_dir = cache_dir
+        self.synthesizer = synthesizer
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, text, lang, slow):
+        key = hashlib.sha1(json.dumps([text, lang, bool(slow)], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def get(self, text, lang=DEFAULT_LANGUAGE, slow=False):
+        """Returns the audio data for the text, synthesizing and storing it on a cache miss."""
+        path = self.path(text, lang, slow)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.hits += 1
+            return data
+        except OSError:
+            pass
+
+        data = self.synthesizer(text, lang, slow)
+        self.misses += 1
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path) # atomic, so concurrent writers never leave a partial file
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error saving speech to cache: {e}")
+        return data
+
+TTS_CACHE = TTSCache()
+
+def word_sound_path(word):
+    return os.path.join(SOUNDS_PATH, f"word_{word}.mp3")
+
+def generate_word_sound(word):
+    """Synthesizes the sound file for a word and returns its path."""
+    filename = word_sound_path(word)
+    data = TTS_CACHE.synthesizer(word, DEFAULT_LANGUAGE, False)
+    temp_path = f"{filename}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, filename)
+    return filename
+
+class SoundPack:
+    """Word sounds pre-converted to the mixer's PCM format and packed into one memory-mapped file."""
+    def __init__(self, pack_file=SOUND_PACK_FILE, index_file=SOUND_PACK_INDEX_FILE):
+        self.pack_file = pack_file
+        self.index_file = index_file
+        self.words = {}
+        self.data = None
+
+    def open(self):
+        """Maps the pack if it exists and matches the mixer format, skipping words whose mp3 changed since packing."""
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if tuple(index.get("format", ())) != pygame.mixer.get_init():
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Sound pack format {index.get('format')} doesn't match mixer {pygame.mixer.get_init()}, loading mp3 files instead.")
+            return self
+        try:
+            with open(self.pack_file, "rb") as f:
+                self.data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError) as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error opening sound pack: {e}")
+            return self
+        for word, (offset, length, mtime) in index["words"].items():
+            try:
+                if os.stat(word_sound_path(word)).st_mtime != mtime:
+                    continue
+            except OSError:
+                pass
+            self.words[word] = (offset, length)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Sound pack opened, {len(self.words)} word sounds.")
+        return self
+
+    def get(self, word):
+        """Returns the packed sound of a word, or None if it isn't in the pack."""
+        entry = self.words.get(word)
+        if entry is None:
+            return None
+        offset, length = entry
+        return pygame.mixer.Sound(buffer=self.data[offset:offset + length])
+
+def pack_sound_bank(pack_file=SOUND_PACK_FILE, index_file=SOUND_PACK_INDEX_FILE):
+    """Converts every word_*.mp3 to the mixer's PCM format and packs them into one file with an offset index."""
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    words = {}
+    offset = 0
+    with open(pack_file + ".tmp", "wb") as f:
+        for filename in sorted(os.listdir(SOUNDS_PATH)):
+            if not (filename.startswith("word_") and filename.endswith(".mp3")):
+                continue
+            path = os.path.join(SOUNDS_PATH, filename)
+            sound = load_sound(path)
+            if sound is None:
+                continue
+            raw = sound.get_raw()
+            f.write(raw)
+            words[filename[len("word_"):-len(".mp3")]] = [offset, len(raw), os.stat(path).st_mtime]
+            offset += len(raw)
+    with open(index_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"format": pygame.mixer.get_init(), "words": words}, f, ensure_ascii=False)
+    os.replace(pack_file + ".tmp", pack_file)
+    os.replace(index_file + ".tmp", index_file)
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Packed {len(words)} word sounds into {pack_file}, {offset / 1024 / 1024:.1f} MB.")
+    return words
+
+class SoundBank:
+    """Word sounds decoded on demand from assets/sounds, warmed per word list and bounded by LRU eviction."""
+    def __init__(self, pack=None, capacity=SOUND_BANK_CAPACITY):
+        self.pack = pack
+        self.capacity = capacity
+        self.sounds = OrderedDict()
+        self.pinned = set() # words of the list being played are never evicted
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def get(self, word):
+        """Returns the sound of a word, decoding it from disk on a miss, or None if it has no sound file yet."""
+        with self.lock:
+            sound = self.sounds.get(word)
+            if sound is not None:
+                self.sounds.move_to_end(word)
+                return sound
+        sound = self.pack.get(word) if self.pack else None
+        if sound is None:
+            filename = word_sound_path(word)
+            if not os.path.exists(filename):
+                return None
+            sound = load_sound(filename)
+        if sound is not None:
+            self.put(word, sound)
+        return sound
+
+    def put(self, word, sound):
+        with self.lock:
+            self.sounds[word] = sound
+            self.sounds.move_to_end(word)
+            for old_word in list(self.sounds):
+                if len(self.sounds) <= self.capacity:
+                    break
+                if old_word not in self.pinned:
+                    del self.sounds[old_word]
+
+    def load_list(self, items):
+        """Pins the words of a list and decodes their sounds on a background thread."""
+        words = [wordobj["word"] for wordobj in items]
+        with self.lock:
+            self.pinned = set(words)
+        return self.executor.submit(self.load_words, words)
+
+    def load_words(self, words):
+        start = time.perf_counter()
+        for word in words:
+            self.get(word)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Loaded {len(words)} word sounds in {(time.perf_counter() - start) * 1000:.0f} ms, {len(self.sounds)} decoded in memory.")
+
+    def on_generated(self, word, filename):
+        """Decodes a freshly generated sound right away only if its list is being played."""
+        if word in self.pinned:
+            sound = load_sound(filename)
+            if sound is not None:
+                self.put(word, sound)
+
+def build_sound_bank(config, workers=SFX_WORKERS, on_generated=None):
+    """Generates the missing word sounds of every list in the config on a bounded thread pool.
+
+    Reports progress per word, calls on_generated(word, filename) for each new file,
+    and returns the generated words and a list of (word, error) failures.
+    """
+    missing = []
+    for game_mode in config.keys():
+        for wordobj in config.get(game_mode)["items"]:
+            word = wordobj["word"]
+            if word not in missing and not os.path.exists(word_sound_path(word)):
+                missing.append(word)
+    generated = []
+    failed = []
+    if not missing:
+        return generated, failed
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Generating {len(missing)} missing word sounds with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate_word_sound, word): word for word in missing}
+        for done, future in enumerate(as_completed(futures), 1):
+            word = futures[future]
+            try:
+                filename = future.result()
+            except Exception as e:
+                failed.append((word, e))
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [{done}/{len(missing)}] Failed to generate sound for \"{word}\": {e}")
+                continue
+            generated.append(word)
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [{done}/{len(missing)}] Generated {filename}")
+            if on_generated:
+                on_generated(word, filename)
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Sound generation finished, {len(generated)} generated, {len(failed)} failed.")
+    return generated, failed
+
+def generate_speech_sound(text):
+    """Returns a Pygame sound object spoken from text, synthesized once and then served from the TTS cache."""
+    gtext = text if text else "nothing"
+    sound = pygame.mixer.Sound(io.BytesIO(TTS_CACHE.get(gtext, DEFAULT_LANGUAGE, False)))
     return sound
 
 def draw_styled_text_box(surface, rect, text_surface, bg_color, padding=15, border_width=2, border_color=BLACK):
@@ -450,6 +1580,53 @@ def set_channel_volume(player, channel, volume):
     """Set the volume for a specific MIDI channel using Control Change (CC 7)."""
     player.write_short(0xB0 | channel, 7, volume)  # 0xB0 is the status byte for Control Change
 
+class FrameScheduler:
+    """Paces a UI loop and collects its events.
+
+    While the loop animates, frames run at active_fps like clock.tick(). Otherwise it blocks in
+    pygame.event.wait() until input or a RECOGNITION_EVENT arrives, or 1 / idle_fps seconds pass,
+    so a screen waiting for the child to speak uses no CPU.
+    """
+    def __init__(self, idle_fps=IDLE_FPS, active_fps=ACTIVE_FPS):
+        self.idle_fps = idle_fps
+        self.active_fps = active_fps
+        self.clock = pygame.time.Clock()
+
+    def events(self, active=False):
+        """Waits until the next frame is due and returns the events that arrived."""
+        if active:
+            self.clock.tick(self.active_fps)
+            return pygame.event.get()
+        event = pygame.event.wait(int(1000 / self.idle_fps))
+        self.clock.tick() # restart the frame timing from now for the next active frame
+        events = [event] if event.type != pygame.NOEVENT else []
+        return events + pygame.event.get()
+
+class FrameStats:
+    """Measures the CPU time spent rendering each frame on the UI thread and logs the average every FRAME_STATS_INTERVAL seconds."""
+    def __init__(self, name, interval=FRAME_STATS_INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.cpu_time = 0.0
+        self.slowest = 0.0
+        self.started = time.perf_counter()
+
+    def begin(self):
+        self.frame_start = time.thread_time()
+
+    def end(self):
+        elapsed = time.thread_time() - self.frame_start
+        self.frames += 1
+        self.cpu_time += elapsed
+        self.slowest = max(self.slowest, elapsed)
+        if self.interval and time.perf_counter() - self.started >= self.interval:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {self.name} rendering: {self.frames} frames, {self.cpu_time * 1000 / self.frames:.2f} ms CPU per frame, slowest {self.slowest * 1000:.2f} ms")
+            self.reset()
+
 # --- UI Elements ---
 class Button:
     """Button UI element."""
@@ -465,7 +1642,7 @@ class Button:
 
     def draw(self, screen, font):
         pygame.draw.rect(screen, self.color, self.rect)
-        rendered_text = font.render(self.text, True, self.text_color)
+        rendered_text = TEXT_CACHE.render(font, self.text, self.text_color)
         text_rect = rendered_text.get_rect(center=self.rect.center) # Center the text in the button
         screen.blit(rendered_text, text_rect)
 
@@ -498,7 +1675,7 @@ class Checkbox:
 class TalkingGame:
     """Main class to manage the Talking Game."""
     def __init__(self):
-        global RUN_SILENCE_THRESHOLD
+        global CLIPART_INDEX
         pygame.init()
 
         # Fonts setup
@@ -520,9 +1697,16 @@ class TalkingGame:
         pygame.display.flip()
 
         # Start listening in a separate thread
-        RUN_SILENCE_THRESHOLD = calibrate_threshold()
-        self.speech_thread = threading.Thread(target=listen_for_speech)
-        self.speech_thread.start()
+        # the noise floor is tracked from the idle microphone from here on
+        CAPTURE.start()
+        self.recognizer = create_recognizer(RECOGNIZER_BACKEND)
+        if RECOGNIZER_WARMUP:
+            self.recognizer.warm_up()
+        self.speech = RecognizerService(self.recognizer)
+        self.speech.start()
+
+        # Index clipart filenames once, so word transitions don't rescan the folder
+        CLIPART_INDEX = ClipartIndex().load()
 
         # Load config
 
@@ -608,26 +1792,23 @@ class TalkingGame:
         self.type_sound = load_sound(SOUND_TYPE_FILE)
 
         self.clock = pygame.time.Clock()
+        self.scheduler = FrameScheduler()
         self.running = True
         self.game_mode = "menu" # menu, words, phrases 
         self.play_welcome_sound = True
+        self.menu_cache = None # menu surfaces, rebuilt when the display mode changes
+        self.menu_cache_mode = None
 
-        self.sounds = {}
-        # load sfx defined in self.config.json from local assets
-        for game_mode in self.config.keys():
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Loading SFX for \"{game_mode}\"...")
-            for wordobj in self.config.get(game_mode)["items"]:
-                word = wordobj["word"]
-                filename = f"assets/sounds/word_{word}.mp3"
-                if os.path.exists(filename):
-                    # load sfx
-                    self.sounds[word] = load_sound(filename)
-                elif GENERATE_SFX and word not in self.sounds:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] file, {filename} doesn't exists, generating...")
-                    tts = gTTS(text=word, lang=DEFAULT_LANGUAGE, slow=False)
-                    tts.save(filename)
-                    pygame.time.wait(500)
-                    self.sounds[word] = load_sound(filename)
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1) # prepares the next word's image and prompt in the background
+
+        # word sfx are decoded per list when it is picked in the menu, see SoundBank.load_list()
+        self.sounds = SoundBank(SoundPack().open())
+        if isinstance(self.recognizer, TemplateRecognizer):
+            self.recognizer.sounds = self.sounds
+        # generate missing sfx in the background, words without a sound yet fall back to generate_speech_sound()
+        if GENERATE_SFX:
+            self.sfx_thread = threading.Thread(target=build_sound_bank, args=(self.config,), kwargs={"on_generated": self.sounds.on_generated}, daemon=True)
+            self.sfx_thread.start()
 
         # Load sounds for prompts
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Loading prompt sounds...")
@@ -663,6 +1844,11 @@ class TalkingGame:
             self.Sound_Good = generate_speech_sound("いい！あなたは言いました：")
             self.Sound_NoHear = generate_speech_sound("聞こえませんでした。")
             self.Sound_Skipped = generate_speech_sound("スキップしました！")
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Prompt sounds loaded, TTS cache hits: {TTS_CACHE.hits}, synthesized: {TTS_CACHE.misses}")
+        PROMPT_COMPOSER.register(self.Sound_PleaseSay, self.Sound_NoGood, self.Sound_Good, self.Sound_NoHear)
+        self.Sound_Beep = load_sound(SOUND_BEEP_FILE)
+        AUDIO_SEQUENCER.start()
+        self.audio = AUDIO_SEQUENCER
 
         # Video setup
         if self.start_fullscreen:
@@ -701,13 +1887,24 @@ class TalkingGame:
                 self.this_index = 0
                 self.note = 0
                 self.note_time = 0
-                self.Sound_Goodjob.play()
+                self.audio.play(self.Sound_Goodjob)
                 song_complete = True
         return song_complete
 
+    def prepare_word(self, item):
+        """Loads the background image and builds the spoken prompt for a word, run on the prefetch thread."""
+        word = item["word"]
+        translate = item.get("translate", "")
+        word_background = load_word_background(translate)
+        new_word_sound = self.sounds.get(word)
+        if new_word_sound is None:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Sound for word '{word}' not found, generating...")
+            new_word_sound = generate_speech_sound(word)
+        new_word_prompt = PROMPT_COMPOSER.compose(self.Sound_PleaseSay, new_word_sound)
+        return word, translate, word_background, new_word_prompt
+
     def run(self):
         """Main game loop."""
-        global RECOGNIZER_STATUS, RECOGNIZED_TEXT, RECOGNIZED_DATA, STOP_APP
         while self.running:
             if self.game_mode == "menu":
                 self.run_menu()
@@ -719,18 +1916,41 @@ class TalkingGame:
                 self.run_words(self.phrase_list, TARGET_PHRASES, self.phrase_order)
             self.clock.tick(FPS)
 
-        # Clean up speech recognition thread
-        STOP_APP = True
-        self.speech_thread.join()
+        # Clean up speech recognition and prefetch threads
+        self.speech.shutdown()
+        self.prefetch_executor.shutdown(wait=False)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognizer stats: {self.recognizer.stats()}")
+        self.sounds.executor.shutdown(wait=False)
 
         # Clean up Pygame resources
         pygame.quit()
 
+    def menu_surfaces(self, dropdown_rect):
+        """Returns the menu background (cover image and title) and the dropdown list, built once per display mode."""
+        mode = (self.screen.get_size(), self.screen.get_bitsize(), self.fullscreen)
+        if self.menu_cache_mode == mode:
+            return self.menu_cache
+
+        background = pygame.Surface(self.screen.get_size()).convert()
+        background.fill(DARK_GRAY)
+        background.blit(IMAGE_CACHE.get(MENU_BACKGROUND_FILE, 1080), (0, 0))
+        prompt_text = self.game_font_large.render("小语音游戏", True, DARK_BLUE)
+        prompt_rect = pygame.Rect(20, 10, self.screen_width - 40, prompt_text.get_height() + 20)
+        pygame.draw.rect(background, LIGHT_YELLOW, prompt_rect.inflate(20, 10))
+        background.blit(prompt_text, (prompt_rect.width // 2 - prompt_text.get_width() // 2, prompt_rect.y + 10))
+
+        dropdown = pygame.Surface(dropdown_rect.size).convert()
+        dropdown.fill(LIGHT_YELLOW)
+        for i, key in enumerate(self.word_list_keys):
+            text_surface = self.font.render(key.replace("word_list_", "").replace("_", " ").title(), True, BLACK)
+            dropdown.blit(text_surface, (5, i * 30 + 5))
+
+        self.menu_cache = {"background": background, "dropdown": dropdown}
+        self.menu_cache_mode = mode
+        return self.menu_cache
+
     def run_menu(self):
         global MUSICAL_KEYBOARD
-        menu_background = pygame.image.load("assets/images/images/cover_speaking_girl.png")
-        menu_background_x, menu_background_y = menu_background.get_size() 
-        menu_background = pygame.transform.smoothscale(menu_background, (menu_background_x * 1080 / menu_background_y, 1080))
 
         """Handles the main menu loop."""
         title_quit_button = Button(self.screen_width - 220, self.screen_height - 70, "Quit", 200, 50, DARK_RED)
@@ -765,39 +1985,42 @@ class TalkingGame:
 
         # ----------------------------------------------------------
 
+        # the menu only changes on input, so it is drawn again only after an event
+        needs_redraw = True
+
         while self.game_mode == "menu" and self.running:
-            self.screen.fill(DARK_GRAY)
-            self.screen.blit(menu_background, (0, 0))
-            
-            title_quit_button.draw(self.screen, self.button_font)
-            title_config_button.draw(self.screen, self.button_font)
-            title_word_button.draw(self.screen, self.button_font)
-            
-            # Draw dropdown if active
-            if dropdown_active:
-                pygame.draw.rect(self.screen, LIGHT_YELLOW, dropdown_rect)
-                for i, key in enumerate(self.word_list_keys):
-                    item_rect = pygame.Rect(dropdown_rect.x, dropdown_rect.y + i * 30, dropdown_rect.width, 30)
-                    text_surface = self.font.render(key.replace("word_list_", "").replace("_", " ").title(), True, BLACK)
-                    self.screen.blit(text_surface, (item_rect.x + 5, item_rect.y + 5))
-                    if key == self.selected_word_list_key:
-                        pygame.draw.rect(self.screen, DARK_GREEN, item_rect, 2) # Highlight selected
-
-            title_phrase_button.draw(self.screen, self.button_font) # Draw phrase button after dropdown
-
-            prompt_text = self.game_font_large.render("小语音游戏", True, DARK_BLUE)
-            prompt_rect = pygame.Rect(20, 10, self.screen_width - 40, prompt_text.get_height() + 20)
-            pygame.draw.rect(self.screen, LIGHT_YELLOW, prompt_rect.inflate(20, 10))
-            self.screen.blit(prompt_text, (prompt_rect.width // 2 - prompt_text.get_width() // 2, prompt_rect.y + 10))
-
-            pygame.display.flip()
+            if needs_redraw:
+                menu_surfaces = self.menu_surfaces(dropdown_rect)
+                self.screen.blit(menu_surfaces["background"], (0, 0))
+
+                title_quit_button.draw(self.screen, self.button_font)
+                title_config_button.draw(self.screen, self.button_font)
+                title_word_button.draw(self.screen, self.button_font)
+
+                # Draw dropdown if active
+                if dropdown_active:
+                    self.screen.blit(menu_surfaces["dropdown"], dropdown_rect)
+                    for i, key in enumerate(self.word_list_keys):
+                        if key == self.selected_word_list_key:
+                            item_rect = pygame.Rect(dropdown_rect.x, dropdown_rect.y + i * 30, dropdown_rect.width, 30)
+                            pygame.draw.rect(self.screen, DARK_GREEN, item_rect, 2) # Highlight selected
+
+                title_phrase_button.draw(self.screen, self.button_font) # Draw phrase button after dropdown
+
+                pygame.display.flip()
+                needs_redraw = False
+
             # Play welcome sound once
             if self.play_welcome_sound:
-                self.Sound_Welcome.play()
+                self.audio.play(self.Sound_Welcome)
                 self.play_welcome_sound = False
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            for event in self.scheduler.events():
+                if event.type not in (pygame.MOUSEMOTION, AUDIO_EVENT):
+                    needs_redraw = True # nothing in the menu reacts to hover
+                if event.type == AUDIO_EVENT:
+                    self.audio.on_end()
+                elif event.type == pygame.QUIT:
                     self.running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_c:
@@ -816,6 +2039,7 @@ class TalkingGame:
                         dropdown_active = not dropdown_active # Toggle dropdown
                     elif title_phrase_button.is_clicked(event.pos):
                         self.type_sound.play()
+                        self.sounds.load_list(self.phrase_list)
                         self.game_mode = "phrase"
                     elif dropdown_active and dropdown_rect.collidepoint(event.pos):
                         # Check if a dropdown item was clicked
@@ -828,6 +2052,7 @@ class TalkingGame:
                                 self.word_list = self.config.get(self.selected_word_list_key)["items"]
                                 # self.word_list = self.config.get(self.selected_word_list_key)["items"]
                                 self.word_order = self.config.get(self.selected_word_list_key)["order"]
+                                self.sounds.load_list(self.word_list)
                                 dropdown_active = False # Close dropdown after selection
                                 self.type_sound.play()
                                 print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Selected word list: {self.selected_word_list_key}")
@@ -836,10 +2061,7 @@ class TalkingGame:
                         self.type_sound.play()
                         self.running = False
 
-            self.clock.tick(FPS)
-
     def run_words(self, item_list, item_target, item_order="random"):
-        global RECOGNIZED_TEXT, RECOGNIZED_DATA, RECOGNIZER_STATUS
         """Handles the words mode loop."""
         back_button =     Button(self.screen_width - 220, self.screen_height - 70, "Back", 200, 50, DARK_RED)
         next_button =     Button(self.screen_width - 220, self.screen_height - 150, "Skip", 200, 50, DARK_GREEN)
@@ -850,23 +2072,15 @@ class TalkingGame:
         if item_order == "random":
             random.shuffle(item_list)
         item_index = 0
-        word = item_list[item_index]["word"]
-        translate = item_list[item_index]["translate"]
-
         # matching_files = [file for file in os.listdir(CLIPART_PATH) if f"_{word.replace(".","").replace("!","").lower()}_" in file.lower()]
         # matching_files = get_matching_files(word)
-        matching_files = get_matching_files(translate)
-        if matching_files:
-            word_background = pygame.image.load(os.path.join(CLIPART_PATH, random.choice(matching_files)))
-        else:
-            word_background = pygame.image.load("assets/images/images/unknown_001.png")
-        img_width, img_height = word_background.get_size()
-        word_background = pygame.transform.smoothscale(word_background, (img_width * (1080 / img_height) / 2, 1080 / 2))
+        word, translate, word_background, new_word_prompt = self.prepare_word(item_list[item_index])
+        # prepare the next word while this one is being answered
+        next_word = self.prefetch_executor.submit(self.prepare_word, item_list[(item_index + 1) % len(item_list)])
 
         # set up microphone image
         img_microphone_width, img_microphone_height = 200, 200
-        img_microphone = pygame.image.load("assets/images/images/microphone_001.png")
-        img_microphone = pygame.transform.smoothscale(img_microphone, (img_microphone_width, img_microphone_height))
+        img_microphone = IMAGE_CACHE.get(MICROPHONE_IMAGE_FILE, img_microphone_height, img_microphone_width)
         img_microphone_rect = pygame.Rect(self.screen_width // 2 - img_microphone_width // 2, self.screen_height - img_microphone_height - 40, img_microphone_width, img_microphone_height)
 
         word_complete = False
@@ -883,48 +2097,132 @@ class TalkingGame:
         msg_box_rect = pygame.Rect(self.screen_width // 2 - box_width // 2, self.screen_height - box_height * 2 - 200, box_width, box_height // 3)
         word_box_rect = pygame.Rect(self.screen_width // 2 - box_width // 2, self.screen_height - box_height * 2 - 130, box_width, box_height)
 
-        while not self.game_mode == "menu" and self.running:
-            self.screen.fill(DARK_GRAY)
+        def draw_scene(surface):
+            """Draws everything but the timer and the dance animation."""
+            surface.fill(DARK_GRAY)
 
             # Display progress
             progress_surface = self.font.render(f"Words Completed: {completed_words}/{item_target}", True, LIGHT_YELLOW)
             progress_rect = progress_surface.get_rect(topleft=(20, 20))
-            self.screen.blit(progress_surface, progress_rect)
+            surface.blit(progress_surface, progress_rect)
 
             if not game_over:
-                back_button.draw(self.screen, self.button_font)
-                next_button.draw(self.screen, self.button_font)
-
-                # Display Timer
-                time_sec = (pygame.time.get_ticks() - start_time) / 1000 if start_time else 0
-                timer_surface = self.font.render(f"Time: {time_sec:.2f}", True, LIGHT_YELLOW)
-                timer_rect = timer_surface.get_rect(topright=(self.screen_width - 20, 20))
-                self.screen.blit(timer_surface, timer_rect)
+                back_button.draw(surface, self.button_font)
+                next_button.draw(surface, self.button_font)
 
                 # Display images
-                self.screen.blit(word_background, (self.screen_width / 2 - word_background.get_width() / 2 - 10, 30))
-                self.screen.blit(img_microphone, img_microphone_rect)
+                surface.blit(word_background, (self.screen_width / 2 - word_background.get_width() / 2 - 10, 30))
+                surface.blit(img_microphone, img_microphone_rect)
 
                 # Display msg box
                 msg_surface = self.msg_font.render("Please say:", True, YELLOW)
-                self.screen.blit(msg_surface, msg_box_rect)
+                surface.blit(msg_surface, msg_box_rect)
 
                 # Display word in styled box
                 word_surface = render_text_wrapped(f"{word} ({translate})", self.game_font, TEXT_COLOR, box_width - 30) 
-                draw_styled_text_box(self.screen, word_box_rect, word_surface, PROMPT_BOX_COLOR)
+                draw_styled_text_box(surface, word_box_rect, word_surface, PROMPT_BOX_COLOR)
                 
                 # Display Instructions
                 instruction_surface = self.font.render("Hint: say the word out loud.", True, WHITE)
                 instruction_rect = instruction_surface.get_rect(left = 20, top = self.screen_height - 50)
-                self.screen.blit(instruction_surface, instruction_rect)
+                surface.blit(instruction_surface, instruction_rect)
 
                 if word_complete:
-                    pygame.draw.rect(self.screen, GREEN, word_box_rect.inflate(20, 10), 3, border_radius=20) # highlight box green if correct
-                
-                # Update the display
+                    pygame.draw.rect(surface, GREEN, word_box_rect.inflate(20, 10), 3, border_radius=20) # highlight box green if correct
+            else:
+                draw_game_over(surface)
+
+        def draw_game_over(surface):
+            """Draws the game over prompt, which stays on top of the dance animation."""
+            back_button.draw(surface, self.button_font)
+            new_game_button.draw(surface, self.button_font)
+            prompt_text = self.font.render("Good job! Continue?", True, DARK_BLUE)
+            prompt_rect = prompt_text.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
+            pygame.draw.rect(surface, LIGHT_YELLOW, prompt_rect.inflate(20, 10))
+            surface.blit(prompt_text, prompt_rect)
+
+        def prompt_and_listen(*sounds):
+            """Plays the sounds and the beep, then starts listening for the current word."""
+            self.audio.play(*sounds, self.Sound_Beep, on_complete=lambda vocabulary=vocabulary: self.speech.listen(vocabulary))
+
+        # retained rendering: the scene is drawn once into a cached layer and only the timer and
+        # dance frame are redrawn on top of it, restoring what they covered from the layer
+        scene = None
+        scene_key = None
+        timer_text = None
+        timer_rect = None
+        dance_rect = None
+        frame_stats = FrameStats("words")
+
+        while not self.game_mode == "menu" and self.running:
+            frame_stats.begin()
+
+            # Display Timer
+            time_sec = (pygame.time.get_ticks() - start_time) / 1000 if start_time else 0
+
+            # play victory reward song and dance
+            dance_image = None
+            if game_over and play_round_complete:
+                # call midi song function until it's finished
+                play_round_complete = not self.midi_play_song()
+                dance_image = self.dance_frames[self.current_frame // 3]
+                self.current_frame = (self.current_frame + 1) % len(self.dance_frames)
+            CAPTURE.noise_floor.pause("song", game_over and play_round_complete) # the speakers would lift the noise floor
+
+            if RETAINED_RENDERING:
+                key = (word, translate, word_background, word_complete, completed_words, game_over, self.fullscreen)
+                if key != scene_key:
+                    scene_key = key
+                    scene = pygame.Surface(self.screen.get_size()).convert()
+                    draw_scene(scene)
+                    self.screen.blit(scene, (0, 0))
+                    timer_text = timer_rect = dance_rect = None
+                    dirty_rects = [self.screen.get_rect()]
+                else:
+                    dirty_rects = []
+
+                if not game_over and f"Time: {time_sec:.2f}" != timer_text:
+                    if timer_rect is not None:
+                        self.screen.blit(scene, timer_rect, timer_rect)
+                        dirty_rects.append(timer_rect)
+                    timer_text = f"Time: {time_sec:.2f}"
+                    timer_surface = self.font.render(timer_text, True, LIGHT_YELLOW)
+                    timer_rect = timer_surface.get_rect(topright=(self.screen_width - 20, 20))
+                    self.screen.blit(timer_surface, timer_rect)
+                    dirty_rects.append(timer_rect)
+
+                if dance_image is not None or dance_rect is not None:
+                    # restore the last frame's area, paint the new frame and put the prompt back on top
+                    area = dance_rect
+                    if dance_image is not None:
+                        dance_rect = dance_image.get_rect(center=(self.screen_width * 9 // 16, self.screen_height * 2 // 5))
+                        area = dance_rect.union(area) if area is not None else dance_rect
+                    else:
+                        dance_rect = None
+                    self.screen.blit(scene, area, area)
+                    if dance_image is not None:
+                        self.screen.blit(dance_image, dance_rect)
+                    self.screen.set_clip(area)
+                    draw_game_over(self.screen)
+                    self.screen.set_clip(None)
+                    dirty_rects.append(area)
+
+                if dirty_rects:
+                    pygame.display.update(dirty_rects)
+            else:
+                draw_scene(self.screen)
+                if not game_over:
+                    timer_surface = self.font.render(f"Time: {time_sec:.2f}", True, LIGHT_YELLOW)
+                    self.screen.blit(timer_surface, timer_surface.get_rect(topright=(self.screen_width - 20, 20)))
+                elif dance_image is not None:
+                    self.screen.blit(dance_image, dance_image.get_rect(center=(self.screen_width * 9 // 16, self.screen_height * 2 // 5)))
+                    draw_game_over(self.screen)
                 pygame.display.flip()
+            frame_stats.end()
 
-                if word_complete:
+            if not game_over:
+                # keep the answer highlighted until its feedback has finished playing
+                if word_complete and self.audio.idle():
 
                     if completed_words == item_target:
                         # completion target reached, game over.
@@ -936,114 +2234,80 @@ class TalkingGame:
                         item_index +=1
                         if item_index >= len(item_list):
                             item_index = 0
-                        word = item_list[item_index]["word"]
-                        translate = item_list[item_index].get("translate", "")
-                        # Load new background image for the word
+                        # Swap in the prefetched background image and prompt for the word
                         # matching_files = [file for file in os.listdir(CLIPART_PATH) if f"_{word.replace(".","").replace("!","").lower()}_" in file.lower()]
-                        matching_files = get_matching_files(translate)
-                        if matching_files:
-                            word_background = pygame.image.load(os.path.join(CLIPART_PATH, random.choice(matching_files)))
-                        else:
-                            # default background if no matching image found
-                            word_background = pygame.image.load("assets/images/images/unknown_001.png")
-                        img_width, img_height = word_background.get_size()
-                        word_background = pygame.transform.smoothscale(word_background, (img_width * (1080 / img_height) / 2, 1080 / 2))
+                        word, translate, word_background, new_word_prompt = next_word.result()
+                        next_word = self.prefetch_executor.submit(self.prepare_word, item_list[(item_index + 1) % len(item_list)])
                         play_new_word_sound = True
                     start_time = None
-                    while pygame.mixer.get_busy():
-                        self.clock.tick(FPS)
 
                 if play_new_word_sound:
                     # Play the sound prompt for the new word
                     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Playing prompt sound for word: {word}")
-                    if self.sounds.get(word):
-                        new_word_sound = self.sounds[word]
-                    else:
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Sound for word '{word}' not found, generating...")
-                        new_word_sound = generate_speech_sound(word)
-
-                    new_word_prompt = merge_sounds(self.Sound_PleaseSay, new_word_sound)
-                    while pygame.mixer.get_busy():
-                        self.clock.tick(FPS)
-                    new_word_prompt.play()
 
                     # turn off the highlight for the word box
                     word_complete = False
 
-                    RECOGNIZER_STATUS = "LISTEN"
-                    RECOGNIZED_TEXT = ""
+                    other_words = [item["word"] for item in item_list if item["word"] != word]
+                    vocabulary = [word] + random.sample(other_words, min(TEMPLATE_DISTRACTORS, len(other_words)))
+                    prompt_and_listen(new_word_prompt)
 
                     play_new_word_sound = False
 
-            else: # Game Over Prompt
-                # play victory reward song and dance
-                if play_round_complete:
-                    # call midi song function until it's finished
-                    play_round_complete = not self.midi_play_song()
-                    
-                    # paint animation frame
-                    current_image = self.dance_frames[self.current_frame // 3]
-                    img_rect = current_image.get_rect(center=(self.screen_width * 9 // 16, self.screen_height * 2 // 5))
-                    self.screen.blit(current_image, img_rect)
-                    self.current_frame = (self.current_frame + 1) % len(self.dance_frames)
-
-                back_button.draw(self.screen, self.button_font)
-                new_game_button.draw(self.screen, self.button_font)
-                prompt_text = self.font.render("Good job! Continue?", True, DARK_BLUE)
-                prompt_rect = prompt_text.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
-                pygame.draw.rect(self.screen, LIGHT_YELLOW, prompt_rect.inflate(20, 10))
-                self.screen.blit(prompt_text, prompt_rect)
-
-                pygame.display.flip()
-
-            if RECOGNIZER_STATUS == "COMPLETE":
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognized text: {RECOGNIZED_TEXT}")
-                # if RECOGNIZED_TEXT.upper() == word.upper():
-                if word.upper() in RECOGNIZED_TEXT.upper():
-                    if  f"SAY {word.upper()}" not in RECOGNIZED_TEXT.upper():
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word matched!")
-                        completed_words += 1
-                        word_complete = True
-                        # play successful answer prompt
-                        recorded_sound = pygame.mixer.Sound(file=io.BytesIO(RECOGNIZED_DATA.get_wav_data()))
-                        combined_sound = merge_sounds(self.Sound_Good, recorded_sound)
-                        combined_sound.play()
-                        RECOGNIZED_TEXT = ""
-                        RECOGNIZED_DATA = None
-                        RECOGNIZER_STATUS = "READY"
-                else:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word did not match.")
-                    # play no good audio prompt
-                    recorded_sound = pygame.mixer.Sound(file=io.BytesIO(RECOGNIZED_DATA.get_wav_data()))
-                    combined_sound = merge_sounds(merge_sounds(self.Sound_NoGood, recorded_sound), new_word_prompt)
-                    combined_sound.play()
-
-                    RECOGNIZED_TEXT = ""
-                    RECOGNIZED_DATA = None
-                    RECOGNIZER_STATUS = "LISTEN"
-            elif RECOGNIZER_STATUS == "ERROR":
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Speech recognition error: " + RECOGNIZED_TEXT)
-                # play no good audio prompt
-                if RECOGNIZED_TEXT == "UNRECOGNIZED":
-                    if RECOGNIZED_DATA is not None:
-                        recorded_sound = pygame.mixer.Sound(file=io.BytesIO(RECOGNIZED_DATA.get_wav_data()))
-                        combined_sound = merge_sounds(merge_sounds(self.Sound_NoGood, recorded_sound), new_word_prompt)
-                    else:
-                        combined_sound = merge_sounds(self.Sound_NoGood, new_word_prompt)
-                elif RECOGNIZED_TEXT == "TIMEOUT":
-                    combined_sound = merge_sounds(self.Sound_NoHear, new_word_prompt)
-                elif RECOGNIZED_TEXT == "API ERROR":
-                    combined_sound = merge_sounds(self.Sound_NoHear, new_word_prompt)
-                combined_sound.play()
-
-                RECOGNIZED_DATA = None
-                RECOGNIZED_TEXT = ""
-                RECOGNIZER_STATUS = "LISTEN"
-
-            for event in pygame.event.get():
+            # animate at full rate while the timer runs or the dance plays, otherwise sleep until something happens
+            active = (start_time is not None and not game_over) or play_round_complete
+            for event in self.scheduler.events(active):
                 if event.type == pygame.QUIT:
                     self.running = False
 
+                elif event.type == AUDIO_EVENT:
+                    self.audio.on_end()
+
+                elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    scene_key = None # only dirty rects are updated, so repaint the whole window after it was covered
+
+                elif event.type == RECOGNITION_EVENT:
+                    if not self.speech.is_current(event.request):
+                        continue # result of a skipped word
+                    if event.status == "PARTIAL":
+                        if word.upper() in event.text.upper():
+                            # the word is already in the partial transcript, end the turn instead of waiting for the pause
+                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word heard in partial transcript: {event.text}")
+                            self.speech.stop_recording()
+                    elif event.status == "COMPLETE":
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recognized text: {event.text}")
+                        # if event.text.upper() == word.upper():
+                        if word.upper() in event.text.upper():
+                            if  f"SAY {word.upper()}" not in event.text.upper():
+                                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word matched!")
+                                completed_words += 1
+                                word_complete = True
+                                # play successful answer prompt
+                                recorded_sound = pygame.mixer.Sound(file=io.BytesIO(event.audio.get_wav_data()))
+                                combined_sound = PROMPT_COMPOSER.compose(self.Sound_Good, recorded_sound)
+                                self.audio.play(combined_sound)
+                                self.speech.cancel()
+                        else:
+                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word did not match.")
+                            # play no good audio prompt
+                            recorded_sound = pygame.mixer.Sound(file=io.BytesIO(event.audio.get_wav_data()))
+                            combined_sound = PROMPT_COMPOSER.compose(self.Sound_NoGood, recorded_sound, new_word_prompt)
+                            prompt_and_listen(combined_sound)
+                    elif event.status == "ERROR":
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Speech recognition error: " + event.text)
+                        # play no good audio prompt
+                        if event.text == "UNRECOGNIZED":
+                            if event.audio is not None:
+                                recorded_sound = pygame.mixer.Sound(file=io.BytesIO(event.audio.get_wav_data()))
+                                combined_sound = PROMPT_COMPOSER.compose(self.Sound_NoGood, recorded_sound, new_word_prompt)
+                            else:
+                                combined_sound = PROMPT_COMPOSER.compose(self.Sound_NoGood, new_word_prompt)
+                        elif event.text == "TIMEOUT":
+                            combined_sound = PROMPT_COMPOSER.compose(self.Sound_NoHear, new_word_prompt)
+                        elif event.text == "API ERROR":
+                            combined_sound = PROMPT_COMPOSER.compose(self.Sound_NoHear, new_word_prompt)
+                        prompt_and_listen(combined_sound)
+
                 elif event.type == pygame.KEYDOWN:
                     # Toggle between fullscreen and windowed modes
                     if event.key == pygame.K_RETURN and pygame.key.get_mods() & pygame.KMOD_ALT:
@@ -1051,7 +2315,6 @@ class TalkingGame:
 
                     if event.key == pygame.K_ESCAPE:
                         self.game_mode = "menu" # Return to menu on ESC
-                        # speech_thread.join()  # Ensure the listening thread has finished
 
                     if not game_over:
                         if start_time is None:
@@ -1066,10 +2329,9 @@ class TalkingGame:
                         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Word skipped!")
                         completed_words += 1
                         word_complete = True
-                        self.Sound_Skipped.play()
-                        RECOGNIZED_TEXT = ""
-                        RECOGNIZED_DATA = None
-                        RECOGNIZER_STATUS = "READY"
+                        self.speech.cancel()
+                        self.audio.stop() # cut the prompt short, and never listen for the skipped word
+                        self.audio.play(self.Sound_Skipped)
                     if game_over:
                         if new_game_button.is_clicked(event.pos):
                             self.type_sound.play()
@@ -1077,29 +2339,38 @@ class TalkingGame:
                             item_index +=1
                             if item_index >= len(item_list):
                                 item_index = 0
-                            word = item_list[item_index]["word"]
-                            translate = item_list[item_index].get("translate", "")
-                            # Load new background image for the word]
+                            # Swap in the prefetched background image and prompt for the word
                             # matching_files = [file for file in os.listdir(CLIPART_PATH) if f"_{word.replace(".","").replace("!","").lower()}_" in file.lower()]
-                            matching_files = get_matching_files(translate)
-                            if matching_files:
-                                word_background = pygame.image.load(os.path.join(CLIPART_PATH, random.choice(matching_files)))
-                            else:
-                                word_background = pygame.image.load("assets/images/images/unknown_001.png")
-                            img_width, img_height = word_background.get_size()
-                            word_background = pygame.transform.smoothscale(word_background, (img_width * (1080 / img_height) / 2, 1080 / 2))
+                            word, translate, word_background, new_word_prompt = next_word.result()
+                            next_word = self.prefetch_executor.submit(self.prepare_word, item_list[(item_index + 1) % len(item_list)])
                             play_new_word_sound = True
                             start_time = None
                             game_over = False
                             self.this_melody = random.choice(self.melodies)
                             self.this_index = 0
                             self.max_index = len(self.this_melody) - 1
-                            while pygame.mixer.get_busy():
-                                pygame.time.Clock().tick(FPS)
-            self.clock.tick(FPS)
+
+        # stop listening for this word when leaving to the menu
+        self.speech.cancel()
+        self.audio.stop()
+        CAPTURE.noise_floor.pause("song", False)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Little Speech Game - Spanish Version")
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build-sounds", help="generate the missing word sounds for a config file and exit")
+    build_parser.add_argument("--config", default=CONFIG_FILE_PATH, help=f"config file to read word lists from (default: {CONFIG_FILE_PATH})")
+    build_parser.add_argument("--workers", type=int, default=SFX_WORKERS, help=f"number of parallel TTS requests (default: {SFX_WORKERS})")
+    subparsers.add_parser("pack-sounds", help=f"convert the word sounds to PCM in {SOUND_PACK_FILE} for instant loading and exit")
+    args = parser.parse_args()
+
+    if args.command == "build-sounds":
+        _, failed = build_sound_bank(load_config(args.config), workers=args.workers)
+        raise SystemExit(1 if failed else 0)
+    elif args.command == "pack-sounds":
+        pack_sound_bank()
+        raise SystemExit(0)
+
     game = TalkingGame()
     game.run()
-    stream.stop()
-    stream.close()
+    CAPTURE.stop()